@@ -5,8 +5,16 @@ Package full of utility decorators
 
 - `retry(num_of_retries=3, interval=1)`: Retries a function upon failure for a specified number of times, with a delay between attempts.
 
+- `retry_batch(failed_items)`: Retries only the failed items of a batch function and merges the results in order.
+
+- `CircuitBreaker`: Closed/open/half-open breaker shared by `retry`-decorated functions, see `circuit_breaker`.
+
+- `RetryBudget`: Token bucket limiting the retries of every `retry`-decorated function sharing it, see `retry_budget`.
+
 - `get_time()`: Measures and prints the execution time of the decorated function.
 
+- `TimingRegistry`: Fixed memory latency histograms of `get_time(registry=...)` functions with a `report()` API.
+
 - `log_decorator` (cls LogManager):
     - `log_init()`: Initializes and configures how logging data should be handled (e.g., terminal, file, JSON).
     - `log_func()`: Logs the entry, exit, and any exceptions of a function to `.jsonl` or `.log` files.
@@ -30,9 +38,11 @@ This module provides easy-to-use decorators for common tasks like retrying faile
 __version__ = "1.0.0"
 __author__ = "MrCode200"
 
-from .retry_decorator import retry
-from .run_time_decorator import get_time
+from .retry_decorator import retry, retry_batch
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .retry_budget import RetryBudget
+from .run_time_decorator import get_time, TimingRegistry
 from .log_decorator import LoggerManager
 from .cache_decorator import Cache
 
-__all__ = ["retry", "get_time", "LoggerManager", "Cache"]
+__all__ = ["retry", "retry_batch", "CircuitBreaker", "CircuitOpenError", "RetryBudget", "get_time", "TimingRegistry", "LoggerManager", "Cache"]
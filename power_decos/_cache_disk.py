@@ -0,0 +1,230 @@
+"""
+Module containing the on-disk second tier used by the `Cache` class
+
+_DiskTier [class]
+- get -> any : returns the value stored under a key, raises KeyError if there is none
+- put : queues a value to be written with an optional ttl, pending writes are flushed in batches
+- delete : removes a key from the disk
+- delete_where : removes the keys of a function, optionally only those matching a predicate
+- clear : removes every key from the disk
+- flush : writes every pending value to the disk
+- items -> iterator : yields the most recently written (key, value) pairs, used to warm up a fresh process
+"""
+
+import os
+import pickle
+import sqlite3
+from threading import Lock
+from time import time
+from weakref import WeakSet, finalize
+
+_PROTOCOL = 5
+_PICKLE_ERRORS = (pickle.PicklingError, TypeError, AttributeError)
+
+
+# Types whose values order the same way in every process
+_ORDERED_TYPES = (str, int, float, bytes, bool)
+
+
+class _SortedSet(tuple):
+    """The items of a frozenset in a canonical order, how frozensets in keys are pickled."""
+    __slots__ = ()
+
+
+def _order(obj: any) -> tuple:
+    """Sort key of a canonical key item, the same in every process unlike the hash based order of sets."""
+    if type(obj) in _ORDERED_TYPES:
+        return 0, type(obj).__name__, obj
+    return 1, type(obj).__name__, pickle.dumps(obj, protocol=_PROTOCOL)
+
+
+def _canonical(obj: any) -> any:
+    """Replace the frozensets nested in tuples of `obj` by `_SortedSet`s."""
+    if type(obj) is tuple:
+        return tuple(_canonical(item) for item in obj)
+    if isinstance(obj, frozenset):
+        return _SortedSet(sorted((_canonical(item) for item in obj), key=_order))
+    return obj
+
+
+def _restore(obj: any) -> any:
+    """Undo `_canonical`."""
+    if type(obj) is tuple:
+        return tuple(_restore(item) for item in obj)
+    if type(obj) is _SortedSet:
+        return frozenset(_restore(item) for item in obj)
+    return obj
+
+
+def _encode_key(key: tuple) -> bytes:
+    """
+    Turn a cache key into bytes which are the same in every process.
+
+    Frozensets (kwargs, fingerprints of dicts and sets, frozenset arguments) iterate in an order depending on
+    the hash seed of the process, so they are pickled with their items sorted.
+    """
+    func_name, args, kwargs = key
+    return pickle.dumps((func_name, _canonical(args), _canonical(kwargs)), protocol=_PROTOCOL)
+
+
+def _decode_key(data: bytes) -> tuple:
+    func_name, args, kwargs = pickle.loads(data)
+    return func_name, _restore(args), _restore(kwargs)
+
+
+# Every open tier, reconnected in the child after a fork
+_TIERS = WeakSet()
+# Connections inherited from the parent, never closed in the child since closing them could checkpoint
+# and remove the write-ahead log the parent is still using
+_INHERITED_CONNECTIONS = []
+
+
+def _reconnect_after_fork():
+    for tier in list(_TIERS):
+        tier._reconnect()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconnect_after_fork)
+
+
+def _write(connection: sqlite3.Connection, lock: Lock, pending: dict):
+    """Write `pending` in a single transaction, kept outside the class so `finalize` does not keep the tier alive."""
+    with lock:
+        if not pending:
+            return
+        rows = [(key, func_name, value, expires) for key, (func_name, value, expires) in pending.items()]
+        pending.clear()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO entries (key, func_name, value, expires) VALUES (?, ?, ?, ?)", rows
+            )
+
+
+class _DiskTier:
+    """
+    A sqlite3 backed store of pickled cache entries.
+
+    Writes are queued and flushed once `batch_size` of them are pending, when `flush` is called
+    or when the tier is garbage collected / the interpreter exits.
+    Values which can't be pickled are silently kept in memory only.
+    A sqlite connection can't be used across a fork, a forked child opens its own and leaves the
+    writes still pending in the parent to the parent.
+    """
+    def __init__(self, path: str, batch_size: int = 64):
+        self.path = path
+        self.batch_size = batch_size
+
+        self._connect()
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key BLOB PRIMARY KEY, func_name TEXT, value BLOB, expires REAL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS entries_func_name ON entries (func_name)")
+        _TIERS.add(self)
+
+    def _connect(self):
+        self._lock = Lock()
+        self._pending = {}
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._finalizer = finalize(self, _write, self._connection, self._lock, self._pending)
+
+    def _reconnect(self):
+        self._finalizer.detach()
+        _INHERITED_CONNECTIONS.append(self._connection)
+        self._connect()
+
+    def get(self, key: tuple) -> any:
+        try:
+            encoded_key = _encode_key(key)
+        except _PICKLE_ERRORS:
+            raise KeyError(key) from None
+
+        with self._lock:
+            row = self._pending.get(encoded_key)
+            if row is not None:
+                _, value, expires = row
+            else:
+                row = self._connection.execute(
+                    "SELECT value, expires FROM entries WHERE key = ?", (encoded_key,)
+                ).fetchone()
+                if row is None:
+                    raise KeyError(key)
+                value, expires = row
+
+        if expires is not None and expires <= time():
+            raise KeyError(key)
+        return pickle.loads(value)
+
+    def put(self, key: tuple, value: any, ttl: float = None):
+        try:
+            encoded_key = _encode_key(key)
+            encoded_value = pickle.dumps(value, protocol=_PROTOCOL)
+        except _PICKLE_ERRORS:
+            return
+
+        expires = time() + ttl if ttl is not None else None
+        with self._lock:
+            self._pending[encoded_key] = (str(key[0]), encoded_value, expires)
+            full = len(self._pending) >= self.batch_size
+
+        if full:
+            self.flush()
+
+    def delete(self, key: tuple):
+        try:
+            encoded_key = _encode_key(key)
+        except _PICKLE_ERRORS:
+            return
+
+        with self._lock:
+            self._pending.pop(encoded_key, None)
+            with self._connection:
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (encoded_key,))
+
+    def delete_where(self, func_name: any, predicate: callable = None):
+        """Delete the entries of `func_name` whose key matches `predicate`, only the rows of that function are read."""
+        func_name = str(func_name)
+        with self._lock:
+            for encoded_key in [encoded_key for encoded_key, (name, _, _) in self._pending.items()
+                                if name == func_name and (predicate is None or predicate(_decode_key(encoded_key)))]:
+                del self._pending[encoded_key]
+
+            with self._connection:
+                if predicate is None:
+                    self._connection.execute("DELETE FROM entries WHERE func_name = ?", (func_name,))
+                    return
+
+                rows = self._connection.execute("SELECT key FROM entries WHERE func_name = ?", (func_name,)).fetchall()
+                self._connection.executemany(
+                    "DELETE FROM entries WHERE key = ?",
+                    [(encoded_key,) for encoded_key, in rows if predicate(_decode_key(encoded_key))]
+                )
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            with self._connection:
+                self._connection.execute("DELETE FROM entries")
+
+    def flush(self):
+        _write(self._connection, self._lock, self._pending)
+
+    def items(self, limit: int = None):
+        """Yield the (key, value) pairs which haven't expired, most recently written first."""
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key, value FROM entries WHERE expires IS NULL OR expires > ? ORDER BY rowid DESC LIMIT ?",
+                (time(), -1 if limit is None else limit)
+            ).fetchall()
+
+        for key, value in rows:
+            yield _decode_key(key), pickle.loads(value)
+
+    def close(self):
+        _TIERS.discard(self)
+        self._finalizer()
+        self._connection.close()
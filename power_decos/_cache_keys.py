@@ -0,0 +1,229 @@
+"""
+Module containing the key building used by the `Cache` class
+
+_KeyBuilder [class]
+- __call__ -> tuple : builds the key (qualified name, args, frozenset(kwargs.items())) of a call
+- fingerprinted -> tuple : builds the key of a call passing unhashable arguments
+- bind_partial -> tuple : maps the arguments of a partial lookup to their places in the keys
+
+_key_builder_for -> _KeyBuilder : returns the builder attached to a decorated function or creates a new one
+_fingerprint_key -> tuple : builds a key after turning every argument into something hashable
+_argument_slots -> iterator : yields (func name, position or keyword name, argument) of every argument of a key
+_resolve_fingerprint -> callable : turns the `fingerprint` argument of `Cache` into a function applied to every argument
+"""
+
+from hashlib import blake2b
+from inspect import Parameter, signature
+from typing import Callable
+
+_NO_KWARGS = frozenset()
+
+
+class _IdentityKey:
+    """Wraps an unhashable object so it is keyed by identity, the reference keeps its id from being reused."""
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: any):
+        self.obj = obj
+
+    def __hash__(self) -> int:
+        return id(self.obj)
+
+    def __eq__(self, other: any) -> bool:
+        return isinstance(other, _IdentityKey) and other.obj is self.obj
+
+    def __reduce__(self):
+        raise TypeError("Identity based keys only make sense inside one process and can't be pickled")
+
+
+def _is_hashable(obj: any) -> bool:
+    try:
+        hash(obj)
+    except TypeError:
+        return False
+    return True
+
+
+def _buffer_fingerprint(obj: any, view: memoryview) -> tuple:
+    """Digest the memory of a buffer protocol object, contiguous buffers are hashed without being copied."""
+    try:
+        digest = blake2b(view).digest()
+    except (BufferError, TypeError):
+        digest = blake2b(view.tobytes()).digest()
+    return type(obj), view.format, view.shape, digest
+
+
+def _structural_fingerprint(obj: any) -> any:
+    """
+    Return `obj` if it is hashable, otherwise a hashable value equal for equal contents.
+
+    Containers are fingerprinted recursively and buffer protocol objects (bytearray, memoryview, array.array,
+    numpy arrays, ...) by a blake2b digest of their memory. Every fingerprint is tagged with the type of the object,
+    so a list and a tuple with the same items don't share a key.
+
+    :raises TypeError: If `obj` is an unhashable object which is neither a container nor a buffer.
+    """
+    if _is_hashable(obj):
+        return obj
+
+    try:
+        view = memoryview(obj)
+    except TypeError:
+        pass
+    else:
+        with view:
+            return _buffer_fingerprint(obj, view)
+
+    if isinstance(obj, dict):
+        return type(obj), frozenset((key, _structural_fingerprint(value)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return type(obj), tuple(_structural_fingerprint(item) for item in obj)
+    if isinstance(obj, (set, frozenset)):
+        return type(obj), frozenset(obj)
+
+    raise TypeError(
+        f"Unhashable argument of type '{type(obj).__name__}' can't be fingerprinted, "
+        f"use fingerprint='identity' or a custom fingerprint callable"
+    )
+
+
+def _identity_fingerprint(obj: any) -> any:
+    """Return `obj` if it is hashable, otherwise a key which is only equal for the very same object."""
+    return obj if _is_hashable(obj) else _IdentityKey(obj)
+
+
+def _resolve_fingerprint(fingerprint: str | Callable) -> callable:
+    """
+    Turn the `fingerprint` argument of `Cache` into the function applied to every argument of an unhashable call.
+
+    :raises ValueError: If `fingerprint` is neither "structural", "identity" nor a callable.
+    """
+    if fingerprint == "structural":
+        return _structural_fingerprint
+    if fingerprint == "identity":
+        return _identity_fingerprint
+    if callable(fingerprint):
+        def custom_fingerprint(obj: any) -> any:
+            return obj if _is_hashable(obj) else fingerprint(obj)
+        return custom_fingerprint
+
+    raise ValueError("fingerprint must be 'structural', 'identity' or a callable")
+
+
+def _fingerprint_key(name: any, args: tuple, kwargs: dict, fingerprint: callable) -> tuple:
+    """Build a key from arguments which may be unhashable by passing each of them through `fingerprint`."""
+    return (name,
+            tuple(fingerprint(arg) for arg in args),
+            frozenset((key, fingerprint(value)) for key, value in kwargs.items()))
+
+
+def _argument_slots(key: tuple):
+    """Yield (func name, position, argument) for the args and (func name, name, argument) for the kwargs of `key`."""
+    func_name, args, kwargs = key
+    for position, value in enumerate(args):
+        yield func_name, position, value
+    for name, value in kwargs:
+        yield func_name, name, value
+
+
+class _KeyBuilder:
+    """
+    Builds signature normalized cache keys for the calls of one function.
+
+    Arguments are bound to the signature of the function and defaults are filled in,
+    so `f(1, b=2)`, `f(1, 2)` and `f(a=1, b=2)` share the same key.
+    Everything which only depends on the function is computed once, and calls passing every
+    positional parameter without keywords skip the binding entirely.
+    """
+    __slots__ = ("name", "_signature", "_fast_arg_count", "_fast_var_positional")
+
+    def __init__(self, func: callable):
+        self.name = f"{func.__module__}.{func.__qualname__}"
+
+        try:
+            self._signature = signature(func)
+        except (TypeError, ValueError):
+            # Some builtins have no signature, their keys are built from the raw arguments
+            self._signature = None
+            self._fast_arg_count = None
+            self._fast_var_positional = False
+            return
+
+        kinds = [parameter.kind for parameter in self._signature.parameters.values()]
+        if Parameter.KEYWORD_ONLY in kinds:
+            # Keyword only defaults always have to be filled in
+            self._fast_arg_count = None
+        else:
+            self._fast_arg_count = kinds.count(Parameter.POSITIONAL_ONLY) + kinds.count(Parameter.POSITIONAL_OR_KEYWORD)
+        self._fast_var_positional = Parameter.VAR_POSITIONAL in kinds
+
+    def bind(self, args: tuple, kwargs: dict) -> tuple[tuple, dict]:
+        """Return the args and kwargs of a call bound to the signature with defaults filled in."""
+        if self._signature is None:
+            return args, kwargs
+
+        try:
+            bound = self._signature.bind(*args, **kwargs)
+        except TypeError:
+            # The call itself is invalid, the function will raise the proper error once it is called
+            return args, kwargs
+
+        bound.apply_defaults()
+        return bound.args, bound.kwargs
+
+    def __call__(self, args: tuple, kwargs: dict) -> tuple:
+        """
+        Build the key of a call, the key is unhashable if one of the arguments is.
+
+        :raises TypeError: If a keyword argument is unhashable.
+        """
+        if not kwargs and self._fast_arg_count is not None and (
+                len(args) == self._fast_arg_count
+                or (self._fast_var_positional and len(args) > self._fast_arg_count)):
+            return self.name, args, _NO_KWARGS
+
+        args, kwargs = self.bind(args, kwargs)
+        return self.name, args, frozenset(kwargs.items()) if kwargs else _NO_KWARGS
+
+    def fingerprinted(self, args: tuple, kwargs: dict, fingerprint: callable) -> tuple:
+        """Build the key of a call passing unhashable arguments, each argument is passed through `fingerprint`."""
+        args, kwargs = self.bind(args, kwargs)
+        return _fingerprint_key(self.name, args, kwargs, fingerprint)
+
+    def bind_partial(self, args: tuple, kwargs: dict) -> tuple[dict, dict] | None:
+        """
+        Bind the arguments of a partial lookup to the signature and return where they are found in the keys:
+        ({index in the key args: value}, {name in the key kwargs: value}).
+
+        Returns None if the function has no signature or the arguments don't fit it.
+        """
+        if self._signature is None:
+            return None
+        try:
+            arguments = self._signature.bind_partial(*args, **kwargs).arguments
+        except TypeError:
+            return None
+
+        positions = {}
+        keywords = {}
+        index = 0
+        for name, parameter in self._signature.parameters.items():
+            if parameter.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD):
+                if name in arguments:
+                    positions[index] = arguments[name]
+                index += 1
+            elif parameter.kind == Parameter.VAR_POSITIONAL:
+                for offset, value in enumerate(arguments.get(name, ())):
+                    positions[index + offset] = value
+            elif parameter.kind == Parameter.KEYWORD_ONLY:
+                if name in arguments:
+                    keywords[name] = arguments[name]
+            else:
+                keywords.update(arguments.get(name, {}))
+        return positions, keywords
+
+
+def _key_builder_for(func: callable) -> _KeyBuilder:
+    """Return the key builder of a function decorated by `Cache.cache_func`, or build one for any other function."""
+    key_builder = getattr(func, "_cache_key_builder", None)
+    return key_builder if key_builder is not None else _KeyBuilder(func)
@@ -0,0 +1,135 @@
+"""
+Module containing the eviction policies used by the `Cache` class
+
+Every policy only tracks the *order* of the keys stored in `Cache.cache`, the values themselves stay in the dict.
+All operations run in constant time.
+
+_LRUPolicy [class]
+- evicts the least recently used key
+_LFUPolicy [class]
+- evicts the least frequently used key, ties are broken by insertion order
+_FIFOPolicy [class]
+- evicts the oldest inserted key
+"""
+
+from collections import OrderedDict
+
+
+class _LRUPolicy:
+    """Least recently used: every hit or insert moves the key to the back of the queue."""
+    def __init__(self):
+        self._order = OrderedDict()
+
+    def insert(self, key):
+        self._order[key] = None
+        self._order.move_to_end(key)
+
+    def access(self, key):
+        self._order.move_to_end(key)
+
+    def remove(self, key):
+        self._order.pop(key, None)
+
+    def victim(self, skip=None):
+        """Return the key to evict next, passing over `skip`."""
+        keys = iter(self._order)
+        key = next(keys)
+        return next(keys) if key == skip else key
+
+    def clear(self):
+        self._order.clear()
+
+
+class _FIFOPolicy(_LRUPolicy):
+    """First in first out: hits and overwrites do not change the position of a key."""
+    def insert(self, key):
+        if key not in self._order:
+            self._order[key] = None
+
+    def access(self, key):
+        pass
+
+
+class _FreqNode:
+    """A bucket of keys sharing the same use count, linked to its neighbouring buckets."""
+    __slots__ = ("freq", "keys", "prev", "next")
+
+    def __init__(self, freq: int):
+        self.freq = freq
+        self.keys = OrderedDict()
+        self.prev = self
+        self.next = self
+
+
+class _LFUPolicy:
+    """
+    Least frequently used, implemented with a doubly linked list of frequency buckets.
+
+    The list is ordered by ascending frequency, so the victim is always the oldest key of the first bucket.
+    """
+    def __init__(self):
+        self._head = _FreqNode(0)  # sentinel, never holds keys
+        self._nodes = {}
+
+    def _insert_after(self, node: _FreqNode, freq: int) -> _FreqNode:
+        new_node = _FreqNode(freq)
+        new_node.prev, new_node.next = node, node.next
+        node.next.prev = new_node
+        node.next = new_node
+        return new_node
+
+    def _unlink_if_empty(self, node: _FreqNode):
+        if not node.keys:
+            node.prev.next = node.next
+            node.next.prev = node.prev
+
+    def insert(self, key):
+        if key in self._nodes:
+            self.access(key)
+            return
+
+        node = self._head.next
+        if node.freq != 1:
+            node = self._insert_after(self._head, 1)
+
+        node.keys[key] = None
+        self._nodes[key] = node
+
+    def access(self, key):
+        node = self._nodes[key]
+        next_node = node.next
+        if next_node.freq != node.freq + 1:
+            next_node = self._insert_after(node, node.freq + 1)
+
+        del node.keys[key]
+        next_node.keys[key] = None
+        self._nodes[key] = next_node
+        self._unlink_if_empty(node)
+
+    def remove(self, key):
+        node = self._nodes.pop(key, None)
+        if node is not None:
+            del node.keys[key]
+            self._unlink_if_empty(node)
+
+    def victim(self, skip=None):
+        """Return the key to evict next, passing over `skip`."""
+        node = self._head.next
+        keys = iter(node.keys)
+        key = next(keys)
+        if key == skip:
+            key = next(keys, None)
+            if key is None:
+                key = next(iter(node.next.keys))
+        return key
+
+    def clear(self):
+        self._head = _FreqNode(0)
+        self._nodes = {}
+
+
+_POLICIES = {
+    "lru": _LRUPolicy,
+    "lfu": _LFUPolicy,
+    "fifo": _FIFOPolicy,
+}
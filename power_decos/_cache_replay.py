@@ -0,0 +1,79 @@
+"""
+Module containing the lazy caching of generators used by the `Cache` class
+
+A generator can only be consumed once, so `Cache.cache_func` stores a `_ReplayBuffer` in its place.
+Items are pulled from the generator only when the first consumer asks for them and are kept in the buffer,
+every later (or concurrent) consumer replays the buffered items and continues pulling from the generator
+once it has caught up.
+
+_ReplayBuffer [class]
+- __iter__ -> iterator : returns a new iterator starting at the first item
+"""
+
+from threading import Lock
+
+
+class _ReplayBuffer:
+    """
+    Shares the items of a generator between any number of iterators, pulling each item from it exactly once.
+
+    If the generator raises, the exception is kept and raised to every iterator reaching that point,
+    and `on_error` is called so the cache can drop the entry.
+    """
+    __slots__ = ("items", "on_error", "_source", "_exception", "_lock", "__weakref__")
+
+    def __init__(self, source, on_error: callable = None):
+        self.items = []
+        self.on_error = on_error
+        self._source = source
+        self._exception = None
+        self._lock = Lock()
+
+    def __iter__(self):
+        return _ReplayIterator(self)
+
+    def _pull(self, index: int) -> any:
+        """Return the item at `index`, pulling it from the source if no other iterator did so yet."""
+        with self._lock:
+            if index < len(self.items):
+                return self.items[index]
+            if self._exception is not None:
+                raise self._exception
+            if self._source is None:
+                raise StopIteration
+
+            try:
+                item = next(self._source)
+            except StopIteration:
+                self._source = None
+                raise
+            except BaseException as exc:
+                self._source = None
+                self._exception = exc
+                if self.on_error is not None:
+                    self.on_error()
+                raise
+
+            self.items.append(item)
+            return item
+
+
+class _ReplayIterator:
+    """Iterates over a `_ReplayBuffer`, buffered items are read without taking its lock."""
+    __slots__ = ("_buffer", "_index")
+
+    def __init__(self, buffer: _ReplayBuffer):
+        self._buffer = buffer
+        self._index = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> any:
+        items = self._buffer.items
+        if self._index < len(items):
+            item = items[self._index]
+        else:
+            item = self._buffer._pull(self._index)
+        self._index += 1
+        return item
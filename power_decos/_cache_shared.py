@@ -0,0 +1,226 @@
+"""
+Module containing the cross-process shared tier used by the `Cache` class
+
+The tier is a fixed size hash table living in a memory mapped file, every process on the host
+mapping the same file reads and writes the same entries. Concurrent access is serialized with a
+file lock (flock on POSIX, msvcrt on Windows) and a thread lock for the threads of one process.
+flock locks belong to the open file, so a forked child reopens the file to get a lock of its own.
+
+File layout: a header (magic, number of slots, slot size) followed by `slots` slots of `slot_size` bytes.
+Each slot starts with (state, write time, expiry, key digest, key length, value length) followed by the
+encoded key and the pickled value. A key can live in any of the `_PROBES` slots following its home slot,
+once all of them are taken the entry written the longest time ago is replaced.
+
+_SharedTier [class]
+- get -> any : returns the value stored under a key, raises KeyError if there is none
+- put : writes a value with an optional ttl, values which don't fit in a slot are not shared
+- delete : removes a key from the table
+- delete_where : removes the keys of a function, optionally only those matching a predicate
+- clear : removes every key from the table
+- flush : does nothing, every write goes straight to the shared memory
+"""
+
+import os
+import pickle
+import struct
+from contextlib import contextmanager
+from hashlib import blake2b
+from mmap import mmap
+from threading import Lock
+from time import time, time_ns
+from weakref import WeakSet
+
+from ._cache_disk import _PICKLE_ERRORS, _PROTOCOL, _decode_key, _encode_key
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_MAGIC = b"PDSHRD01"
+_FILE_HEADER = struct.Struct("<8sII")
+_SLOT_HEADER = struct.Struct("<BQd16sII")
+_HEADER_SIZE = 64
+_PROBES = 8
+
+_EMPTY, _USED = 0, 1
+
+# Every open tier, reopened in the child after a fork
+_TIERS = WeakSet()
+
+
+def _reopen_after_fork():
+    for tier in list(_TIERS):
+        tier._reopen()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reopen_after_fork)
+
+
+class _SharedTier:
+    """A fixed size, memory mapped hash table of pickled cache entries shared by every process opening `path`."""
+    def __init__(self, path: str, slots: int = 4096, slot_size: int = 4096):
+        if slot_size <= _SLOT_HEADER.size:
+            raise ValueError(f"shared_slot_size must be > {_SLOT_HEADER.size}")
+
+        self.path = path
+        self._thread_lock = Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o600)
+
+        with self._locked(exclusive=True):
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            header = os.read(self._fd, _FILE_HEADER.size)
+            if len(header) == _FILE_HEADER.size and header[:len(_MAGIC)] == _MAGIC:
+                # Another process created the table already, its geometry wins
+                _, slots, slot_size = _FILE_HEADER.unpack(header)
+            else:
+                os.ftruncate(self._fd, _HEADER_SIZE + slots * slot_size)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, _FILE_HEADER.pack(_MAGIC, slots, slot_size))
+
+        self.slots = slots
+        self.slot_size = slot_size
+        self._mmap = mmap(self._fd, _HEADER_SIZE + slots * slot_size)
+        _TIERS.add(self)
+
+    def _reopen(self):
+        """Give a forked child its own file lock, the shared mapping inherited from the parent stays valid."""
+        self._thread_lock = Lock()
+        fd, self._fd = self._fd, os.open(self.path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        os.close(fd)
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        with self._thread_lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    os.lseek(self._fd, 0, os.SEEK_SET)
+                    msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def _offsets(self, digest: bytes):
+        home = int.from_bytes(digest[:8], "little") % self.slots
+        for probe in range(min(_PROBES, self.slots)):
+            yield _HEADER_SIZE + ((home + probe) % self.slots) * self.slot_size
+
+    def _find(self, digest: bytes, encoded_key: bytes) -> int:
+        """Return the offset of the slot holding `encoded_key`, or -1. The file lock has to be held."""
+        for offset in self._offsets(digest):
+            state, _, _, slot_digest, key_length, _ = _SLOT_HEADER.unpack_from(self._mmap, offset)
+            if state != _USED or slot_digest != digest or key_length != len(encoded_key):
+                continue
+
+            key_start = offset + _SLOT_HEADER.size
+            if self._mmap[key_start:key_start + key_length] == encoded_key:
+                return offset
+        return -1
+
+    @staticmethod
+    def _digest(encoded_key: bytes) -> bytes:
+        return blake2b(encoded_key, digest_size=16).digest()
+
+    def get(self, key: tuple) -> any:
+        try:
+            encoded_key = _encode_key(key)
+        except _PICKLE_ERRORS:
+            raise KeyError(key) from None
+        digest = self._digest(encoded_key)
+
+        with self._locked(exclusive=False):
+            offset = self._find(digest, encoded_key)
+            if offset == -1:
+                raise KeyError(key)
+
+            _, _, expires, _, key_length, value_length = _SLOT_HEADER.unpack_from(self._mmap, offset)
+            value_start = offset + _SLOT_HEADER.size + key_length
+            value = self._mmap[value_start:value_start + value_length]
+
+        if expires and expires <= time():
+            raise KeyError(key)
+        return pickle.loads(value)
+
+    def put(self, key: tuple, value: any, ttl: float = None):
+        try:
+            encoded_key = _encode_key(key)
+            encoded_value = pickle.dumps(value, protocol=_PROTOCOL)
+        except _PICKLE_ERRORS:
+            return
+        if _SLOT_HEADER.size + len(encoded_key) + len(encoded_value) > self.slot_size:
+            return
+
+        digest = self._digest(encoded_key)
+        expires = time() + ttl if ttl is not None else 0.0
+
+        with self._locked(exclusive=True):
+            offset = self._find(digest, encoded_key)
+            if offset == -1:
+                offset = self._free_or_oldest(digest)
+
+            # The slot is marked empty while its payload is rewritten
+            self._mmap[offset] = _EMPTY
+            payload_start = offset + _SLOT_HEADER.size
+            self._mmap[payload_start:payload_start + len(encoded_key)] = encoded_key
+            value_start = payload_start + len(encoded_key)
+            self._mmap[value_start:value_start + len(encoded_value)] = encoded_value
+            _SLOT_HEADER.pack_into(self._mmap, offset, _USED, time_ns(), expires, digest,
+                                   len(encoded_key), len(encoded_value))
+
+    def _free_or_oldest(self, digest: bytes) -> int:
+        oldest_offset, oldest_written = -1, None
+        for offset in self._offsets(digest):
+            state, written, _, _, _, _ = _SLOT_HEADER.unpack_from(self._mmap, offset)
+            if state != _USED:
+                return offset
+            if oldest_written is None or written < oldest_written:
+                oldest_offset, oldest_written = offset, written
+        return oldest_offset
+
+    def delete(self, key: tuple):
+        try:
+            encoded_key = _encode_key(key)
+        except _PICKLE_ERRORS:
+            return
+        digest = self._digest(encoded_key)
+
+        with self._locked(exclusive=True):
+            offset = self._find(digest, encoded_key)
+            if offset != -1:
+                self._mmap[offset] = _EMPTY
+
+    def delete_where(self, func_name: any, predicate: callable = None):
+        """Delete the entries of `func_name` whose key matches `predicate`, the table has no index so every slot is read."""
+        with self._locked(exclusive=True):
+            for slot in range(self.slots):
+                offset = _HEADER_SIZE + slot * self.slot_size
+                state, _, _, _, key_length, _ = _SLOT_HEADER.unpack_from(self._mmap, offset)
+                if state != _USED:
+                    continue
+
+                key_start = offset + _SLOT_HEADER.size
+                key = _decode_key(self._mmap[key_start:key_start + key_length])
+                if key[0] == func_name and (predicate is None or predicate(key)):
+                    self._mmap[offset] = _EMPTY
+
+    def clear(self):
+        with self._locked(exclusive=True):
+            for slot in range(self.slots):
+                self._mmap[_HEADER_SIZE + slot * self.slot_size] = _EMPTY
+
+    def flush(self):
+        pass
+
+    def close(self):
+        _TIERS.discard(self)
+        self._mmap.close()
+        os.close(self._fd)
@@ -0,0 +1,59 @@
+"""
+Module containing the size estimation used by the `Cache` class
+
+_deep_sizeof -> int : estimates the memory held by an object and everything it references
+"""
+
+import sys
+from collections import deque
+
+# Objects which can't reference other objects, walking into them is wasted time
+_ATOMIC_TYPES = (str, bytes, bytearray, int, float, complex, bool, type(None), range, type)
+
+
+def _buffer_nbytes(obj: any) -> int:
+    try:
+        with memoryview(obj) as view:
+            return view.nbytes
+    except TypeError:
+        return 0
+
+
+def _deep_sizeof(obj: any) -> int:
+    """
+    Estimate the number of bytes held by `obj` by walking everything it references.
+
+    Containers, instance `__dict__`s and `__slots__` are followed, objects referenced more than once are
+    only counted once. Buffer protocol objects (memoryviews, arrays, numpy arrays, ...) count at least
+    their `nbytes`, as `sys.getsizeof` does not include the memory of views.
+    """
+    seen = set()
+    pending = deque([obj])
+    size = 0
+
+    while pending:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+
+        size += max(sys.getsizeof(current, 0), _buffer_nbytes(current))
+        if isinstance(current, _ATOMIC_TYPES):
+            continue
+
+        if isinstance(current, dict):
+            pending.extend(current.keys())
+            pending.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            pending.extend(current)
+
+        instance_dict = getattr(current, "__dict__", None)
+        if isinstance(instance_dict, dict):
+            pending.append(instance_dict)
+
+        slots = getattr(type(current), "__slots__", ())
+        for slot in (slots,) if isinstance(slots, str) else slots:
+            if hasattr(current, slot):
+                pending.append(getattr(current, slot))
+
+    return size
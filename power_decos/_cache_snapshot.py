@@ -0,0 +1,162 @@
+"""
+Module containing the snapshot format used by `Cache.dump` and `Cache.load`
+
+A snapshot is a stream of records written one entry at a time, so dumping never builds a second copy of the cache.
+Each record is a pickle (protocol 5) of (key, value, expiry, cost) followed by the raw memory of its large buffers:
+`bytes`, `bytearray` and `array.array` objects and buffers pickled out-of-band (numpy arrays, ...) of at least
+`_OUT_OF_BAND_SIZE` bytes are written straight from their memory instead of being copied into the pickle.
+The pickler catches them through `persistent_id`, the only hook pickle calls for `bytes` and `bytearray` objects.
+Loading maps the file: `bytes`, `bytearray` and arrays are copied once out of the mapping, out-of-band buffers
+are handed back as slices of it, so values able to wrap a buffer (e.g. numpy arrays) don't copy their memory at all.
+
+File layout: magic, then records of (pickle length, number of buffers, buffer lengths...) followed by the pickle
+and the buffers, every buffer starting at a multiple of `_ALIGNMENT`. A record with a pickle length of 0 ends the file.
+
+_dump : writes (key, value, expiry, cost) entries to a snapshot file
+_load -> iterator : yields the (key, value, expiry, cost) entries of a snapshot file
+"""
+
+import io
+import os
+import pickle
+import struct
+from array import array
+from mmap import ACCESS_COPY, mmap
+
+from ._cache_disk import _PICKLE_ERRORS, _PROTOCOL
+
+_MAGIC = b"PDSNAP01"
+_RECORD_HEADER = struct.Struct("<QI")
+_BUFFER_LENGTH = struct.Struct("<Q")
+_ALIGNMENT = 64
+_OUT_OF_BAND_SIZE = 64 * 1024
+
+
+def _padding(position: int) -> int:
+    return -position % _ALIGNMENT
+
+
+class _Pickler(pickle.Pickler):
+    """Pickles an entry, collecting the memory of its large buffers in `buffers` instead of copying it."""
+    def __init__(self, file: io.BytesIO):
+        super().__init__(file, protocol=_PROTOCOL)
+        self.buffers = []
+
+    def persistent_id(self, obj: any) -> tuple | None:
+        kind = type(obj)
+        if kind is bytes or kind is bytearray or kind is array:
+            view = memoryview(obj).cast("B")
+            pid = (kind.__name__, len(self.buffers), obj.typecode if kind is array else None)
+        elif kind is pickle.PickleBuffer:
+            try:
+                view = obj.raw()
+            except BufferError:
+                # Not contiguous, pickled in-band
+                return None
+            pid = ("buffer", len(self.buffers), None)
+        else:
+            return None
+
+        if view.nbytes < _OUT_OF_BAND_SIZE:
+            return None
+        self.buffers.append(view)
+        return pid
+
+
+class _Unpickler(pickle.Unpickler):
+    """Unpickles an entry, restoring its large buffers from `buffers`, the slices of the mapped snapshot."""
+    def __init__(self, data: memoryview, buffers: list):
+        super().__init__(io.BytesIO(data))
+        self.buffers = buffers
+
+    def persistent_load(self, pid: tuple) -> any:
+        kind, index, typecode = pid
+        view = self.buffers[index]
+        if kind == "bytes":
+            return bytes(view)
+        if kind == "bytearray":
+            return bytearray(view)
+        if kind == "array":
+            restored = array(typecode)
+            restored.frombytes(view)
+            return restored
+        return view
+
+
+def _dump(path: str, entries) -> int:
+    """
+    Write `entries` to `path` and return the number of entries written, entries which can't be pickled are skipped.
+
+    The snapshot is written next to `path` and moved in place once complete, so readers never see a partial file.
+    """
+    temporary_path = f"{path}.tmp"
+    written = 0
+
+    with open(temporary_path, "wb") as file:
+        file.write(_MAGIC)
+        position = len(_MAGIC)
+
+        for entry in entries:
+            stream = io.BytesIO()
+            pickler = _Pickler(stream)
+            try:
+                pickler.dump(entry)
+            except _PICKLE_ERRORS:
+                continue
+
+            data = stream.getbuffer()
+            views = pickler.buffers
+            header = _RECORD_HEADER.pack(len(data), len(views)) + b"".join(
+                _BUFFER_LENGTH.pack(view.nbytes) for view in views
+            )
+            file.write(header)
+            file.write(data)
+            position += len(header) + len(data)
+
+            for view in views:
+                file.write(b"\0" * _padding(position))
+                position += _padding(position)
+                file.write(view)
+                position += view.nbytes
+            written += 1
+
+        file.write(_RECORD_HEADER.pack(0, 0))
+
+    os.replace(temporary_path, path)
+    return written
+
+
+def _load(path: str):
+    """
+    Yield the (key, value, expiry, cost) entries stored in the snapshot at `path`.
+
+    The file is mapped copy-on-write: out-of-band buffers are slices of the mapping, values built on top of them
+    stay writable without ever changing the file, and the mapping lives as long as one of them does.
+
+    :raises ValueError: If `path` is not a snapshot written by `_dump`.
+    """
+    with open(path, "rb") as file:
+        if file.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"'{path}' is not a cache snapshot")
+        view = memoryview(mmap(file.fileno(), 0, access=ACCESS_COPY))
+
+    position = len(_MAGIC)
+    while True:
+        data_length, buffer_count = _RECORD_HEADER.unpack_from(view, position)
+        position += _RECORD_HEADER.size
+        if not data_length:
+            return
+
+        lengths = [_BUFFER_LENGTH.unpack_from(view, position + index * _BUFFER_LENGTH.size)[0]
+                   for index in range(buffer_count)]
+        position += buffer_count * _BUFFER_LENGTH.size
+        data = view[position:position + data_length]
+        position += data_length
+
+        buffers = []
+        for length in lengths:
+            position += _padding(position)
+            buffers.append(view[position:position + length])
+            position += length
+
+        yield _Unpickler(data, buffers).load()
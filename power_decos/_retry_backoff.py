@@ -0,0 +1,52 @@
+"""
+Module containing the backoff strategies used by the `retry` decorator
+
+Every strategy is a function `(attempt, previous delay) -> delay` returning the time to sleep after the failed `attempt`.
+The jittered strategies spread the retries of many clients over time, so they don't hit a recovering
+dependency in lockstep.
+
+_resolve_backoff -> callable : turns the `backoff` argument of `retry` into a strategy capped by `max_delay`
+"""
+
+from random import uniform
+from typing import Callable
+
+# Doubling more often than this only overflows, any sane `max_delay` is reached long before
+_MAX_DOUBLINGS = 64
+
+
+def _resolve_backoff(backoff: str | Callable, delay: float, max_delay: float = None) -> callable:
+    """
+    Turn the `backoff` argument of `retry` into a function returning the delay after a failed attempt.
+
+    - "fixed": always `delay`
+    - "exponential": `delay` doubled after every attempt
+    - "full_jitter": a random delay between 0 and the exponential delay
+    - "decorrelated_jitter": a random delay between `delay` and three times the previous delay
+    - a callable receiving the attempt number and the previous delay and returning the next delay
+
+    :raises ValueError: If `backoff` is neither one of the names above nor a callable.
+    """
+    if backoff == "fixed":
+        def strategy(attempt: int, previous: float) -> float:
+            return delay
+    elif backoff == "exponential":
+        def strategy(attempt: int, previous: float) -> float:
+            return delay * 2 ** min(attempt - 1, _MAX_DOUBLINGS)
+    elif backoff == "full_jitter":
+        def strategy(attempt: int, previous: float) -> float:
+            return uniform(0, delay * 2 ** min(attempt - 1, _MAX_DOUBLINGS))
+    elif backoff == "decorrelated_jitter":
+        def strategy(attempt: int, previous: float) -> float:
+            return uniform(delay, previous * 3)
+    elif callable(backoff):
+        strategy = backoff
+    else:
+        raise ValueError("backoff must be 'fixed', 'exponential', 'full_jitter', 'decorrelated_jitter' or a callable")
+
+    if max_delay is None:
+        return strategy
+
+    def capped_strategy(attempt: int, previous: float) -> float:
+        return min(strategy(attempt, previous), max_delay)
+    return capped_strategy
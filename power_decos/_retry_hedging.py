@@ -0,0 +1,169 @@
+"""
+Module containing the hedged attempts used by the `retry` decorator
+
+An attempt which has not finished within a latency threshold gets a speculative duplicate, the first duplicate
+to succeed wins. Losing threads can't be interrupted, they are abandoned on the `_AttemptPool` of the function
+and counted until they finish; losing asyncio tasks are cancelled.
+The threshold is either fixed or a percentile of the latencies of recent successful attempts.
+
+_Hedger [class]
+- call -> any : runs an attempt on the worker pool of the function, hedging it once it is slower than the threshold
+- call_async -> any : awaits an attempt as a task, hedging it once it is slower than the threshold
+- threshold -> float : the current latency threshold, None while too few latencies were recorded
+"""
+
+import asyncio
+import re
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from time import monotonic, perf_counter
+
+from ._retry_pool import _AttemptPool
+from ._retry_timeout import _AttemptTimeout
+
+_PERCENTILE = re.compile(r"p(\d+(?:\.\d+)?)")
+# Latencies needed before a learned percentile is trusted
+_MIN_SAMPLES = 20
+
+
+class _Hedger:
+    """
+    Runs the attempts of one decorated function with up to `max_hedges` speculative duplicates.
+
+    :param hedge_after: Seconds after which an attempt is hedged, or "p<percentile>" (e.g. "p95")
+                        to learn the threshold from the latencies of the last `window` successful attempts.
+    :param max_hedges: Maximum number of duplicates launched per attempt.
+    :param window: Number of recent latencies a learned threshold is computed from.
+    :param pool: The pool the duplicates run on, defaults to a pool of the hedger allowing 8 abandoned losers.
+
+    :raises ValueError: If `hedge_after` is neither a positive number nor a percentile between p0 and p100.
+    """
+    def __init__(self, hedge_after: float | str, max_hedges: int = 1, window: int = 100, pool: _AttemptPool = None):
+        self.max_hedges = max_hedges
+        self.pool = pool if pool is not None else _AttemptPool(8)
+        self._latencies = None
+        self._percentile = None
+        self._threshold = None
+
+        if isinstance(hedge_after, str):
+            match = _PERCENTILE.fullmatch(hedge_after)
+            if match is None or not 0 < float(match.group(1)) < 100:
+                raise ValueError("hedge_after must be > 0 or a percentile like 'p95'")
+            self._percentile = float(match.group(1)) / 100
+            self._latencies = deque(maxlen=window)
+            self._recorded = 0
+        elif hedge_after <= 0:
+            raise ValueError("hedge_after must be > 0 or a percentile like 'p95'")
+        else:
+            self._threshold = hedge_after
+
+    @property
+    def threshold(self) -> float | None:
+        return self._threshold
+
+    def _record(self, latency: float):
+        """Record the latency of a successful attempt, the learned threshold is recomputed every few latencies."""
+        if self._latencies is None:
+            return
+        self._latencies.append(latency)
+        self._recorded += 1
+        if len(self._latencies) >= _MIN_SAMPLES and self._recorded % 10 == 0:
+            latencies = sorted(self._latencies)
+            self._threshold = latencies[min(int(len(latencies) * self._percentile), len(latencies) - 1)]
+
+    def _timed(self, func: callable, args: tuple, kwargs: dict) -> any:
+        start_time = perf_counter()
+        result = func(*args, **kwargs)
+        self._record(perf_counter() - start_time)
+        return result
+
+    def call(self, func: callable, args: tuple, kwargs: dict, timeout: _AttemptTimeout = None) -> any:
+        """
+        Return the result of the first successful duplicate of `func(*args, **kwargs)`.
+
+        The duplicates run on the pool of the hedger and are waited for from the calling thread, losers still
+        running are abandoned. With a `timeout` they are waited for until the timeout elapsed since the first one
+        started. Attempts which can't be hedged (no threshold yet, too many abandoned losers) run on the calling thread.
+
+        :raises TimeoutError: If a `timeout` is given and no duplicate succeeded within it,
+                              or too many abandoned attempts are still running.
+        :raises: The exception of the first attempt if every duplicate failed.
+        """
+        threshold = self._threshold
+        if threshold is None or (timeout is None and self.pool.full):
+            if timeout is None:
+                return self._timed(func, args, kwargs)
+            return timeout.call(self._timed, (func, args, kwargs), {})
+
+        if timeout is not None:
+            timeout.check()
+        future, started = self.pool.submit(self._timed, func, args, kwargs)
+        # Waiting for a free thread neither counts against the threshold nor the timeout
+        started.wait()
+        deadline = None if timeout is None else monotonic() + timeout.timeout
+        pending = {future}
+        hedges = 0
+        first_exception = None
+        try:
+            while pending:
+                wait_time = threshold if hedges < self.max_hedges else None
+                if deadline is not None:
+                    remaining = max(deadline - monotonic(), 0)
+                    wait_time = remaining if wait_time is None else min(wait_time, remaining)
+                done, pending = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+                for future in done:
+                    exception = future.exception()
+                    if exception is None:
+                        return future.result()
+                    if first_exception is None:
+                        first_exception = exception
+
+                if not done:
+                    if deadline is not None and monotonic() >= deadline:
+                        raise TimeoutError(f"Attempt timed out after {timeout.timeout}s")
+                    if self.pool.full:
+                        # Too many abandoned attempts are still running, wait for the running duplicates
+                        hedges = self.max_hedges
+                    else:
+                        pending.add(self.pool.submit(self._timed, func, args, kwargs)[0])
+                        hedges += 1
+        finally:
+            for loser in pending:
+                self.pool.abandon(loser)
+
+        raise first_exception
+
+    async def call_async(self, func: callable, args: tuple, kwargs: dict) -> any:
+        """Await the first successful duplicate of `func(*args, **kwargs)`, the other duplicates are cancelled."""
+        threshold = self._threshold
+        if threshold is None:
+            return await self._timed_async(func, args, kwargs)
+
+        pending = {asyncio.ensure_future(self._timed_async(func, args, kwargs))}
+        hedges = 0
+        first_exception = None
+        try:
+            while pending:
+                timeout = threshold if hedges < self.max_hedges else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for task in done:
+                    exception = task.exception()
+                    if exception is None:
+                        return task.result()
+                    if first_exception is None:
+                        first_exception = exception
+
+                if not done:
+                    pending.add(asyncio.ensure_future(self._timed_async(func, args, kwargs)))
+                    hedges += 1
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise first_exception
+
+    async def _timed_async(self, func: callable, args: tuple, kwargs: dict) -> any:
+        start_time = perf_counter()
+        result = await func(*args, **kwargs)
+        self._record(perf_counter() - start_time)
+        return result
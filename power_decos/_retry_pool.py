@@ -0,0 +1,67 @@
+"""
+Module containing the worker pool running the sync attempts of one `retry` decorated function
+
+A thread can't be interrupted, so an attempt which is given up on (timed out or lost a hedge race) keeps running
+in the background: such abandoned attempts are counted until they finish. The pool has `max_abandoned` threads
+on top of the threads of the running attempts, so the hung attempts of one function never starve the attempts
+of another function, and every attempt reports when it actually starts so time spent queued is not counted
+against its timeout.
+
+_AttemptPool [class]
+- submit -> (Future, Event) : starts an attempt on the pool, the event is set once it is running
+- abandon : gives up on a submitted attempt, counting it until it finishes if it is already running
+- full -> bool : whether `max_abandoned` abandoned attempts are still running
+"""
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock
+
+# Threads of the attempts which were not abandoned, the default size of a ThreadPoolExecutor
+_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+class _AttemptPool:
+    """
+    Runs the sync attempts of one decorated function, the threads are created on first use.
+
+    :param max_abandoned: Maximum number of abandoned attempts still running in the background.
+    """
+    def __init__(self, max_abandoned: int):
+        self.max_abandoned = max_abandoned
+        self.abandoned = 0
+        self._lock = Lock()
+        self._pool = None
+
+    @property
+    def full(self) -> bool:
+        return self.abandoned >= self.max_abandoned
+
+    def _finished(self, future: Future):
+        with self._lock:
+            self.abandoned -= 1
+
+    def submit(self, func: callable, *args, **kwargs) -> tuple[Future, Event]:
+        """Start `func(*args, **kwargs)` on the pool, returns its future and an event set once it is running."""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_abandoned + _WORKERS, thread_name_prefix="power_decos-retry"
+                    )
+
+        started = Event()
+
+        def run():
+            started.set()
+            return func(*args, **kwargs)
+
+        return self._pool.submit(run), started
+
+    def abandon(self, future: Future):
+        """Give up on `future`, it is cancelled if it has not started yet and counted until it finishes otherwise."""
+        if not future.cancel():
+            with self._lock:
+                self.abandoned += 1
+            # Runs at once if the attempt finished in the meantime
+            future.add_done_callback(self._finished)
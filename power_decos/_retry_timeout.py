@@ -0,0 +1,60 @@
+"""
+Module containing the per attempt timeouts used by the `retry` decorator
+
+Sync attempts run on the `_AttemptPool` of the decorated function and are awaited up to the timeout,
+counted from the moment the attempt starts running. An attempt which times out keeps running in the background
+as an abandoned attempt, and once `max_abandoned` of them are still running new attempts fail at once instead of
+taking another thread. Coroutine attempts are cancelled by `asyncio.wait_for`.
+
+_AttemptTimeout [class]
+- call -> any : runs an attempt on the worker pool, raising TimeoutError once it ran longer than the timeout
+- call_async -> any : awaits an attempt, cancelling it once it took longer than the timeout
+"""
+
+import asyncio
+
+from ._retry_pool import _AttemptPool
+
+
+class _AttemptTimeout:
+    """
+    Bounds the duration of the attempts of one decorated function.
+
+    :param timeout: Seconds an attempt may take.
+    :param max_abandoned: Maximum number of timed out sync attempts still running in the background.
+    """
+    def __init__(self, timeout: float, max_abandoned: int):
+        self.timeout = timeout
+        self.pool = _AttemptPool(max_abandoned)
+
+    def check(self):
+        """:raises TimeoutError: If too many abandoned attempts are still running."""
+        if self.pool.full:
+            raise TimeoutError(f"{self.pool.abandoned} timed out attempts are still running")
+
+    def call(self, func: callable, args: tuple, kwargs: dict) -> any:
+        """
+        Return `func(*args, **kwargs)` if it finishes within the timeout.
+
+        :raises TimeoutError: If the attempt timed out or too many abandoned attempts are still running.
+        """
+        self.check()
+        future, started = self.pool.submit(func, *args, **kwargs)
+        # Waiting for a free thread does not count against the timeout
+        started.wait()
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            if future.done():
+                # The function raised a TimeoutError of its own
+                raise
+            self.pool.abandon(future)
+            raise TimeoutError(f"Attempt timed out after {self.timeout}s") from None
+
+    async def call_async(self, func: callable, args: tuple, kwargs: dict) -> any:
+        """
+        Await `func(*args, **kwargs)`, cancelling it if it does not finish within the timeout.
+
+        :raises TimeoutError: If the attempt timed out.
+        """
+        return await asyncio.wait_for(func(*args, **kwargs), self.timeout)
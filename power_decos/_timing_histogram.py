@@ -0,0 +1,94 @@
+"""
+Module containing the latency histogram used by the `get_time` decorator
+
+The histogram is log-linear (HDR style): every power of two is split into `_SUB_BUCKETS` linear buckets,
+so every recorded duration is kept with a relative error below 1 / `_SUB_BUCKETS` while the memory stays
+fixed no matter how many durations are recorded. Durations are recorded in nanoseconds, durations longer
+than `_MAX_VALUE` nanoseconds (about 19 hours) land in the last bucket.
+
+_Histogram [class]
+- record : adds a duration in nanoseconds
+- percentile -> int : returns the duration in nanoseconds below which the given fraction of the durations lie
+- summary -> dict : returns count, sum, min, max and the p50/p90/p99/p999 durations in seconds
+"""
+
+from array import array
+from math import ceil
+
+_SUB_BUCKET_BITS = 6
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+_MAX_VALUE = (1 << 46) - 1
+_MAX_SHIFT = _MAX_VALUE.bit_length() - _SUB_BUCKET_BITS - 1
+_BUCKETS = (_MAX_SHIFT + 1) * _SUB_BUCKETS + _SUB_BUCKETS
+
+_PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999))
+
+
+def _bucket_index(value: int) -> int:
+    """Return the bucket of `value`: values below 2 * `_SUB_BUCKETS` are exact, larger ones share their bucket."""
+    if value < 2 * _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+    return shift * _SUB_BUCKETS + (value >> shift)
+
+
+def _bucket_upper_bound(index: int) -> int:
+    """Return the largest value stored in the bucket `index`."""
+    if index < 2 * _SUB_BUCKETS:
+        return index
+    shift = index // _SUB_BUCKETS - 1
+    return ((index - shift * _SUB_BUCKETS + 1) << shift) - 1
+
+
+class _Histogram:
+    """
+    A fixed size log-linear histogram of durations in nanoseconds.
+
+    Recording takes no lock, concurrent records from several threads may occasionally lose a count.
+    """
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = array("Q", bytes(8 * _BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value: int):
+        value = min(value, _MAX_VALUE)
+        self.counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> int:
+        """Return the duration below which `fraction` (0 < fraction <= 1) of the recorded durations lie, 0 if empty."""
+        rank = ceil(fraction * self.count)
+        if not rank:
+            return 0
+
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(_bucket_upper_bound(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """Return count, sum, min, max and the p50/p90/p99/p999 durations, durations are in seconds."""
+        summary = {
+            "count": self.count,
+            "sum": self.total / 1e9,
+            "min": (self.min or 0) / 1e9,
+            "max": self.max / 1e9,
+        }
+        for name, fraction in _PERCENTILES:
+            summary[name] = self.percentile(fraction) / 1e9
+        return summary
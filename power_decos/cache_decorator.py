@@ -7,17 +7,134 @@ It includes a `Cache` class that can be used to cache and retrieve
 function results, improving performance for expensive or frequently
 called functions.
 
-cls `Cache`:
+cls `Cache(maxsize: int = None, policy: str = "lru", ttl: float = None, thread_safe: bool = False, disk_path: str = None)`:
     - `clear_cache()`: Clears the cache, resetting it to an empty state.
+    - `flush()`: Writes every pending entry to the disk tier.
+    - `dump(path: str)`: Writes a snapshot of the entries held in memory to a file.
+    - `load(path: str)`: Adds the entries of a snapshot written by `dump` to the cache.
+    - `invalidate(func_name: callable, *args, **kwargs)`: Removes the entry of a single call.
+    - `invalidate_function(func_name: callable)`: Removes every entry of a function.
+    - `invalidate_where(predicate: callable, func_name: callable = None)`: Removes the entries matching a predicate.
+    - `invalidate_tags(*tags)`: Removes the entries marked with any of the tags.
+    - `stats()`: Returns a snapshot of the hit/miss/insert/eviction counters, overall and per function.
+    - `reset_stats()`: Resets the counters returned by `stats()`.
     - `manual_cache(func_name: callable, return_value: any, *args, **kwargs)`: Manually adds a result to the cache.
-    - `cache(func: callable)`: Decorator that caches the result of a function call.
+    - `cache_func(func: callable, soft_ttl: float = None, hard_ttl: float = None, tags = None)`: Decorator that caches the result of a function call.
+    - `cache_batch(func: callable, tags = None)`: Decorator that caches the per item results of a function taking a list of items.
     - `get_cached_value(func_name: callable, compare_all: bool = True, *args, **kwargs)`: Retrieve cached results based on function name and optionally arguments.
 
 Usage:
     Instantiate the Cache class and decorate functions with the
     `@cache` decorator to enable caching.
+
+    Pass `maxsize` to bound the number of entries (evicting by the "lru", "lfu" or "fifo" `policy`)
+    and/or `ttl` to let entries expire after the given amount of seconds.
+    `cache_func(soft_ttl=...)` serves entries older than `soft_ttl` while they are recomputed in the background,
+    `hard_ttl` overrides `ttl` for that function and sets the point where callers have to wait again.
+    Pass `max_bytes` to bound the estimated memory of the stored values instead, and `weak_values=True`
+    to let the garbage collector reclaim results nobody else holds on to.
+
+    Pass `thread_safe=True` when the cache is shared between threads: concurrent misses on the
+    same key then wait for a single computation and share its result or exception.
+
+    Coroutine functions are supported as well, the awaited result is cached and concurrent
+    awaiters of the same key share one task.
+    Generators returned by a function are cached lazily: items are buffered as the first caller pulls them,
+    later callers replay the buffer and continue pulling from the generator once they have caught up.
+
+    Pass `disk_path` to back the in-memory entries with a sqlite3 file: misses in memory fall through
+    to the disk, disk hits are promoted to memory and a new process using the same file starts warm.
+    Coroutine functions read and write the disk and shared tiers in the default executor of their loop.
+    Pass `shared_path` to share entries between every process on the host through a memory mapped
+    hash table, e.g. between the workers of a gunicorn or multiprocessing deployment.
+    `dump` and `load` snapshot a primed cache to pre-warm freshly spawned workers, large buffers
+    (bytearrays, numpy arrays, ...) are streamed out-of-band and restored from a memory map without copies.
+
+    Unhashable arguments (lists, dicts, sets, bytearrays, arrays, ...) are fingerprinted: containers
+    structurally and buffers by a digest of their memory. Pass `fingerprint="identity"` to key them by
+    identity instead, or a callable turning such an argument into something hashable.
 """
-from functools import wraps
+import asyncio
+import logging
+import sys
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial, wraps
+from inspect import iscoroutinefunction
+from threading import Event, Lock, RLock
+from time import monotonic, perf_counter, time
+from types import GeneratorType
+from typing import Callable
+from weakref import WeakKeyDictionary, ref
+
+from ._cache_disk import _DiskTier
+from ._cache_keys import _KeyBuilder, _argument_slots, _fingerprint_key, _key_builder_for, _resolve_fingerprint
+from ._cache_policies import _POLICIES
+from ._cache_replay import _ReplayBuffer
+from ._cache_shared import _SharedTier
+from ._cache_snapshot import _dump, _load
+from ._cache_sizing import _deep_sizeof
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class _WeakValue(ref):
+    """A weak reference stored in place of a value when `weak_values` is enabled."""
+    __slots__ = ()
+
+
+class _Flight:
+    """A computation in progress which other threads missing on the same key can wait for."""
+    __slots__ = ("done", "result", "exception")
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.exception = None
+
+    def wait(self) -> any:
+        self.done.wait()
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+
+class _CacheStats:
+    """
+    Counters of a single cached function.
+
+    The counters are plain attributes incremented without any lock, so they cost next to nothing
+    on the hit path but may slightly undercount when many threads hit the same function at once.
+    """
+    __slots__ = ("hits", "misses", "inserts", "evictions", "expirations", "time_saved", "entries", "bytes")
+    _COUNTERS = ("hits", "misses", "inserts", "evictions", "expirations", "time_saved")
+
+    def __init__(self):
+        self.entries = 0
+        self.bytes = 0
+        self.reset()
+
+    def reset(self):
+        """Reset the counters, `entries` and `bytes` describe the current content and are kept."""
+        for counter in self._COUNTERS:
+            setattr(self, counter, 0)
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _AsyncFlight:
+    """A task computing a key which every awaiter missing on that key shares."""
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
 
 class Cache:
     """A simple caching mechanism for storing and retrieving function results.
@@ -25,28 +142,760 @@ class Cache:
     This class provides a way to cache the results of function calls, 
     improving performance for expensive or frequently called functions.
 
-    :ivar cache: Saved output to tuple(func.__name, args, frozenset(kwargs.item()))
+    :ivar cache: Saved output to tuple(func.__module__.func.__qualname__, args, frozenset(kwargs.item())),
+                 args and kwargs are bound to the signature of the function with defaults filled in.
     """
-    def __init__(self):
+    def __init__(
+            self,
+            maxsize: int = None,
+            policy: str = "lru",
+            ttl: float = None,
+            thread_safe: bool = False,
+            lock_stripes: int = 16,
+            disk_path: str = None,
+            disk_batch_size: int = 64,
+            warm_start: bool = True,
+            fingerprint: str | Callable = "structural",
+            max_bytes: int = None,
+            sizeof: Callable = None,
+            weak_values: bool = False,
+            shared_path: str = None,
+            shared_slots: int = 4096,
+            shared_slot_size: int = 4096,
+            refresh_workers: int = 4
+    ):
+        """
+        :keyword int maxsize: Maximum number of entries, None means unbounded.
+        :keyword str policy: Eviction policy used once `maxsize` is reached: "lru", "lfu" or "fifo".
+        :keyword float ttl: Time in seconds after which an entry expires, None means never.
+        :keyword bool thread_safe: Guard the cache with locks and de-duplicate concurrent misses on the same key.
+                                   Hits and stores of every key take one shared lock, only held for a few dict
+                                   operations, while the computations of concurrent misses never hold it.
+        :keyword int lock_stripes: Number of locks the in-flight computations are spread over when `thread_safe` is True,
+                                   so misses on unrelated keys don't wait for each other. The entries themselves
+                                   are not striped, as the eviction order, expiry and byte budget span every key.
+        :keyword str disk_path: Path of a sqlite3 file used as a persistent second tier, None keeps the cache in memory only.
+        :keyword int disk_batch_size: Number of pending writes which triggers a flush to the disk tier.
+        :keyword bool warm_start: Load the most recently written disk entries (up to `maxsize`) into memory on creation.
+        :keyword fingerprint: How unhashable arguments are keyed: "structural", "identity" or a callable
+                              returning a hashable fingerprint of the argument.
+        :keyword int max_bytes: Maximum estimated size of the values held in memory, None means unbounded.
+                                Values larger than the whole budget are not kept in memory.
+        :keyword sizeof: Callable estimating the size of a value in bytes. Defaults to a deep `sys.getsizeof` walk
+                         when `max_bytes` is given and to a shallow `sys.getsizeof` otherwise.
+        :keyword bool weak_values: Only keep weak references to values which support them, such values
+                                   don't count towards `max_bytes` and are dropped once they are garbage collected.
+        :keyword str shared_path: Path of a file memory mapped as a hash table shared by every process using it,
+                                  None disables the shared tier. The first process creating the file sets its size.
+        :keyword int shared_slots: Number of entries the shared tier holds, older entries are replaced once it is full.
+        :keyword int shared_slot_size: Size in bytes of a shared slot, entries whose pickled key and value
+                                       don't fit are not shared. The tier takes `shared_slots * shared_slot_size` bytes.
+        :keyword int refresh_workers: Maximum number of threads refreshing stale entries of `soft_ttl` functions.
+
+        :raises ValueError: If `maxsize`, `max_bytes`, `lock_stripes`, `disk_batch_size`, `shared_slots` or
+                            `refresh_workers` is less than 1,
+                            `shared_slot_size` is too small to hold a slot header, `ttl` is less than
+                            or equal to 0, `policy` is unknown or `fingerprint` is not supported.
+        """
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be None or >= 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be None or > 0")
+        if policy not in _POLICIES:
+            raise ValueError(f"Unknown policy '{policy}', expected one of {tuple(_POLICIES)}")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be None or >= 1")
+        if lock_stripes < 1:
+            raise ValueError("lock_stripes must be >= 1")
+        if disk_batch_size < 1:
+            raise ValueError("disk_batch_size must be >= 1")
+        if shared_slots < 1:
+            raise ValueError("shared_slots must be >= 1")
+        if refresh_workers < 1:
+            raise ValueError("refresh_workers must be >= 1")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.weak_values = weak_values
+        self.thread_safe = thread_safe
+        self.refresh_workers = refresh_workers
+        self._sizeof = sizeof or (_deep_sizeof if max_bytes is not None else sys.getsizeof)
+        self._fingerprint = _resolve_fingerprint(fingerprint)
+
+        # Guards the entries and their bookkeeping, it is only ever held for dict sized operations
+        self._lock = RLock() if thread_safe else nullcontext()
+        # In-flight computations, striped so misses on unrelated keys don't contend on the same lock
+        self._stripes = [(Lock(), {}) for _ in range(lock_stripes)] if thread_safe else []
+        # event loop -> {key: _AsyncFlight}, tasks can only be shared within the loop which created them
+        self._async_flights = WeakKeyDictionary()
+        # Stale entries being recomputed in the background, the pool is created by the first `soft_ttl` refresh
+        self._refresh_pool = None
+        self._refresh_lock = Lock()
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        # function name -> (hard ttl, soft ttl) of functions decorated with their own ttls
+        self._function_ttls = {}
+        # function name -> tuple of tags or callable returning the tags of a call
+        self._function_tags = {}
+
         self.cache = {}
+        # Only bounded caches need to track the order of their keys
+        self._policy = _POLICIES[policy]() if maxsize is not None or max_bytes is not None else None
+        # key -> (expiry time, queue); keys sharing a ttl share a queue, so insertion order is expiry order
+        self._expiry = {}
+        self._expiry_queues = {}
+        # key -> time after which an entry of a `soft_ttl` function is refreshed in the background
+        self._stale_at = {}
+        # Secondary indexes used by partial lookups, dicts are used as insertion ordered sets
+        self._func_index = {}
+        self._args_index = {}
+        self._kwargs_index = {}
+        # (func name, position or keyword name, argument) -> keys, used by partial lookups through a function
+        self._argument_index = {}
+        self._tag_index = {}
+        self._key_tags = {}
+        # key -> time the computation of the entry took / estimated size of the value in bytes
+        self._costs = {}
+        self._sizes = {}
+        self._total_bytes = 0
+        # function name -> _CacheStats, entries are never dropped so decorated functions can keep a reference
+        self._function_stats = {}
+
+        # Slower stores looked up in order after a miss in memory, every computed result is written to all of them
+        self._tiers = []
+        if shared_path is not None:
+            self._tiers.append(_SharedTier(shared_path, shared_slots, shared_slot_size))
+        if disk_path is not None:
+            disk_tier = _DiskTier(disk_path, disk_batch_size)
+            self._tiers.append(disk_tier)
+            if warm_start:
+                for key, value in reversed(list(disk_tier.items(limit=maxsize))):
+                    self._store(key, value)
 
     def clear_cache(self):
         """Clear the cache.
 
         Resets the cache to an empty state, removing all stored results.
         """
-        self.cache = {}
-    
+        with self._lock:
+            self.cache = {}
+            self._expiry = {}
+            self._expiry_queues = {}
+            self._stale_at = {}
+            self._func_index = {}
+            self._args_index = {}
+            self._kwargs_index = {}
+            self._argument_index = {}
+            self._tag_index = {}
+            self._key_tags = {}
+            self._costs = {}
+            self._sizes = {}
+            self._total_bytes = 0
+            for stats in self._function_stats.values():
+                stats.entries = stats.bytes = 0
+            if self._policy is not None:
+                self._policy.clear()
+
+        for tier in self._tiers:
+            tier.clear()
+
+    def flush(self):
+        """Write every pending entry to the disk tier, does nothing for memory only caches."""
+        for tier in self._tiers:
+            tier.flush()
+
+    def dump(self, path: str) -> int:
+        """Write a snapshot of the entries held in memory to `path`, entries only stored in the tiers are not included.
+
+        Entries are streamed one by one and large buffers are written straight from their memory,
+        keys or values which can't be pickled are skipped.
+
+        :param path: The file the snapshot is written to, an existing file is replaced once the snapshot is complete.
+        :return: The number of entries written.
+        """
+        with self._lock:
+            now, wall_time = monotonic(), time()
+            entries = []
+            for key, stored in self.cache.items():
+                value = self._unwrap(stored)
+                if value is None and type(stored) is _WeakValue:
+                    continue
+                expiry = self._expiry.get(key)
+                if expiry is not None and expiry[0] <= now:
+                    continue
+                expires = wall_time + expiry[0] - now if expiry is not None else None
+                entries.append((key, value, expires, self._costs.get(key, 0.0)))
+
+        return _dump(path, entries)
+
+    def load(self, path: str) -> int:
+        """Add the entries of a snapshot written by `dump` to the memory of the cache.
+
+        The snapshot is memory mapped, values wrapping a buffer (e.g. numpy arrays) share the mapped memory
+        instead of being copied. Entries which expired since the snapshot was taken are skipped,
+        the others expire according to the ttls of this cache.
+
+        :param path: The snapshot file.
+        :return: The number of entries loaded.
+        :raises ValueError: If `path` is not a snapshot.
+        """
+        loaded = 0
+        for key, value, expires, cost in _load(path):
+            if expires is not None and expires <= time():
+                continue
+            with self._lock:
+                self._store(key, value, cost)
+            loaded += 1
+        return loaded
+
+    def invalidate(self, func_name: callable, *args, **kwargs) -> int:
+        """Remove the entry of a single call from memory and the tiers.
+
+        :param func_name: The function (or the name of the function) whose entry is removed.
+        :param args: Positional arguments of the call.
+        :param kwargs: Keyword arguments of the call.
+        :return: The number of entries removed from memory (0 or 1).
+        """
+        key = self._make_key(func_name, args, kwargs)
+        with self._lock:
+            removed = key in self.cache
+            if removed:
+                self._remove(key)
+
+        for tier in self._tiers:
+            tier.delete(key)
+        return int(removed)
+
+    def invalidate_function(self, func_name: callable) -> int:
+        """Remove every entry of a function from memory and the tiers, leaving other functions untouched.
+
+        :param func_name: The function (or the name of the function) whose entries are removed.
+        :return: The number of entries removed from memory.
+        """
+        if callable(func_name):
+            func_name = _key_builder_for(func_name).name
+
+        with self._lock:
+            keys = list(self._func_index.get(func_name, ()))
+            for key in keys:
+                self._remove(key)
+
+        for tier in self._tiers:
+            tier.delete_where(func_name)
+        return len(keys)
+
+    def invalidate_where(self, predicate: callable, func_name: callable = None) -> int:
+        """Remove the entries for which `predicate(key, value)` is true.
+
+        Only the entries held in memory are passed to `predicate`, matching keys are removed from the tiers as well.
+
+        :param predicate: Callable receiving the key (function name, args, frozenset(kwargs.items())) and the value.
+        :param func_name: Only test the entries of this function (or function name) instead of the whole cache.
+        :return: The number of entries removed from memory.
+        """
+        if callable(func_name):
+            func_name = _key_builder_for(func_name).name
+
+        with self._lock:
+            candidates = self.cache if func_name is None else self._func_index.get(func_name, {})
+            keys = [key for key in candidates if predicate(key, self._unwrap(self.cache[key]))]
+            for key in keys:
+                self._remove(key)
+
+        for tier in self._tiers:
+            for key in keys:
+                tier.delete(key)
+        return len(keys)
+
+    def invalidate_tags(self, *tags) -> int:
+        """Remove every entry marked with any of `tags` by the `tags` argument of `cache_func`/`cache_batch`.
+
+        :param tags: The tags whose entries are removed.
+        :return: The number of entries removed from memory.
+        """
+        with self._lock:
+            keys = list(dict.fromkeys(key for tag in tags for key in self._tag_index.get(tag, ())))
+            for key in keys:
+                self._remove(key)
+            function_tags = list(self._function_tags.items())
+
+        if self._tiers:
+            # Entries living only in the tiers are found through the functions which can produce the tags
+            tags = set(tags)
+
+            def tagged(key: tuple) -> bool:
+                try:
+                    return not tags.isdisjoint(self._tags_for(key))
+                except Exception:
+                    # The tag callable can't handle the fingerprints of unhashable arguments, such entries are removed
+                    return True
+
+            for func_name, tagger in function_tags:
+                if callable(tagger):
+                    predicate = tagged
+                elif not tags.isdisjoint(tagger):
+                    predicate = None
+                else:
+                    continue
+                for tier in self._tiers:
+                    tier.delete_where(func_name, predicate)
+        return len(keys)
+
+    def _tags_for(self, key: tuple) -> tuple:
+        """
+        Return the tags of an entry from its key, used when the call which stored it is unknown.
+
+        Only the keys of hashable calls hold the bound arguments, tag callables may fail on fingerprinted keys.
+        """
+        tags = self._function_tags.get(key[0])
+        if tags is None:
+            return ()
+        if callable(tags):
+            tags = tags(*key[1], **dict(key[2]))
+            return (tags,) if isinstance(tags, str) else tuple(tags)
+        return tags
+
+    def _call_tags(self, key_builder: _KeyBuilder, args: tuple, kwargs: dict) -> tuple | None:
+        """Return the tags of a call, tag callables receive its actual bound arguments. None if the function has no tags."""
+        tags = self._function_tags.get(key_builder.name)
+        if tags is None or not callable(tags):
+            return tags
+        args, kwargs = key_builder.bind(args, kwargs)
+        tags = tags(*args, **kwargs)
+        return (tags,) if isinstance(tags, str) else tuple(tags)
+
+    def _register_tags(self, func_name: str, tags: any):
+        if tags is None:
+            return
+        if isinstance(tags, str):
+            tags = (tags,)
+        with self._lock:
+            self._function_tags[func_name] = tags if callable(tags) else tuple(tags)
+
+    def _replayable(self, key: tuple, result: any) -> any:
+        """Return a `_ReplayBuffer` in place of a generator result, the entry is dropped if the generator raises."""
+        if type(result) is not GeneratorType:
+            return result
+
+        buffer = _ReplayBuffer(result)
+        buffer.on_error = lambda: self._discard(key, buffer)
+        return buffer
+
+    def _discard(self, key: tuple, value: any):
+        """Remove `key` if it still holds `value`."""
+        with self._lock:
+            if key in self.cache and self._unwrap(self.cache[key]) is value:
+                self._remove(key)
+
+    def _unwrap(self, value: any) -> any:
+        """Return the value behind a weak reference stored by `weak_values`, or None if it was collected."""
+        return value() if type(value) is _WeakValue else value
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of the cache statistics.
+
+        The returned dict contains the totals of every counter and a "functions" dict with the counters of each function:
+
+        - hits / misses: Calls of a cached function answered from the cache / computed.
+        - inserts: Entries added to memory, including manual and promoted entries.
+        - evictions / expirations: Entries removed to respect `maxsize` or `max_bytes` (or collected weak values) / `ttl`.
+        - entries / bytes: Number of entries in memory and their estimated size.
+        - time_saved: Seconds of computation saved by hits, measured from the call which computed the entry.
+        """
+        with self._lock:
+            functions = {name: stats.as_dict() for name, stats in self._function_stats.items()}
+
+        totals = {counter: sum(stats[counter] for stats in functions.values()) for counter in _CacheStats.__slots__}
+        totals["functions"] = functions
+        return totals
+
+    def reset_stats(self):
+        """Reset the counters returned by `stats()`, the entries and bytes held in memory are still reported."""
+        with self._lock:
+            for stats in self._function_stats.values():
+                stats.reset()
+
+    def _stats_for(self, func_name: any) -> _CacheStats:
+        stats = self._function_stats.get(func_name)
+        if stats is None:
+            stats = self._function_stats.setdefault(func_name, _CacheStats())
+        return stats
+
+    def _get(self, key: tuple, call_tags: callable = None, tiers: bool = True) -> any:
+        """
+        Return the value stored under `key` in memory or in one of the tiers, or `_MISSING`.
+
+        `call_tags` returns the tags of the call, it is only called if the value is promoted from a tier.
+        """
+        with self._lock:
+            result = self._lookup(key)
+        if result is _MISSING and tiers and self._tiers:
+            result = self._read_tiers(key)
+            if result is not _MISSING:
+                self._promote(key, result, call_tags)
+        return result
+
+    async def _get_async(self, key: tuple, call_tags: callable = None) -> any:
+        """`_get` for coroutines, the tiers are read in the default executor of the loop so their I/O doesn't block it."""
+        with self._lock:
+            result = self._lookup(key)
+        if result is _MISSING and self._tiers:
+            result = await asyncio.get_running_loop().run_in_executor(None, self._read_tiers, key)
+            if result is not _MISSING:
+                self._promote(key, result, call_tags)
+        return result
+
+    def _read_tiers(self, key: tuple) -> any:
+        """Return the value stored under `key` in the first tier holding it, or `_MISSING`."""
+        for tier in self._tiers:
+            try:
+                return tier.get(key)
+            except KeyError:
+                continue
+        return _MISSING
+
+    def _promote(self, key: tuple, value: any, call_tags: callable = None):
+        """Store a value found in a tier in memory."""
+        tags = call_tags() if call_tags is not None else None
+        with self._lock:
+            self._store(key, value, tags=tags)
+
+    def _save(self, key: tuple, value: any, cost: float = 0.0, tags: tuple = None, tiers: bool = True):
+        """Store `value` in memory and write it through to the tiers."""
+        with self._lock:
+            self._store(key, value, cost, tags)
+        if tiers and self._tiers:
+            self._write_tiers({key: value})
+
+    async def _save_async(self, key: tuple, value: any, cost: float = 0.0, tags: tuple = None):
+        """`_save` for coroutines, the tiers are written in the default executor of the loop."""
+        with self._lock:
+            self._store(key, value, cost, tags)
+        if self._tiers:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_tiers, {key: value})
+
+    def _write_tiers(self, entries: dict):
+        """Write every (key, value) pair of `entries` through to the tiers."""
+        for key, value in entries.items():
+            ttl, _ = self._ttls_for(key[0])
+            for tier in self._tiers:
+                tier.put(key, value, ttl)
+
+    def _ttls_for(self, func_name: any) -> tuple:
+        """Return the (hard ttl, soft ttl) entries of `func_name` are stored with."""
+        return self._function_ttls.get(func_name, (self.ttl, None))
+
+    def _is_stale(self, key: tuple) -> bool:
+        stale_at = self._stale_at.get(key)
+        return stale_at is not None and stale_at <= monotonic()
+
+    def _refresh(self, key: tuple, compute: callable, tags: tuple = None):
+        """Recompute a stale entry on the refresh thread pool unless it is already being refreshed."""
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(self.refresh_workers, thread_name_prefix="power_decos-refresh")
+
+        self._refresh_pool.submit(self._run_refresh, key, compute, tags)
+
+    def _run_refresh(self, key: tuple, compute: callable, tags: tuple):
+        try:
+            start_time = perf_counter()
+            value = compute()
+            self._save(key, value, perf_counter() - start_time, tags)
+        except Exception:
+            # The stale value keeps being served, the next hit schedules another refresh
+            logger.exception("Background refresh of %s failed", key[0])
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
+    def _refresh_async(self, key: tuple, compute: callable, tags: tuple = None):
+        """Recompute a stale entry of a coroutine function in a task of the running loop."""
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        task = asyncio.get_running_loop().create_task(self._run_refresh_async(key, compute, tags))
+        # The loop only keeps weak references to its tasks
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _run_refresh_async(self, key: tuple, compute: callable, tags: tuple):
+        try:
+            start_time = perf_counter()
+            value = await compute()
+            await self._save_async(key, value, perf_counter() - start_time, tags)
+        except Exception:
+            logger.exception("Background refresh of %s failed", key[0])
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
+    def _lookup(self, key: tuple) -> any:
+        """Return the value stored under `key` or `_MISSING`, dropping it if it has expired."""
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            return _MISSING
+
+        if self._expiry:
+            expiry = self._expiry.get(key)
+            if expiry is not None and expiry[0] <= monotonic():
+                self._remove(key)
+                self._stats_for(key[0]).expirations += 1
+                return _MISSING
+
+        if self.weak_values and type(value) is _WeakValue:
+            value = value()
+            if value is None:
+                self._evict(key)
+                return _MISSING
+
+        if self._policy is not None:
+            self._policy.access(key)
+        return value
+
+    def _store(self, key: tuple, value: any, cost: float = 0.0, tags: tuple = None):
+        """
+        Store `value` under `key`, expiring and evicting entries as needed to respect `ttl`, `maxsize` and `max_bytes`.
+
+        Without `tags` the tags of the entry are computed from its key.
+        """
+        if tags is None and self._function_tags:
+            try:
+                tags = self._tags_for(key)
+            except Exception:
+                # The tag callable can't handle the fingerprints of unhashable arguments, without the tags
+                # of the actual call the entry is not kept in memory so invalidate_tags can't miss it
+                if key in self.cache:
+                    self._remove(key)
+                return
+        if self.weak_values:
+            try:
+                value = _WeakValue(value)
+            except TypeError:
+                pass
+        size = 0 if type(value) is _WeakValue else self._sizeof(value)
+
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Keeping it would flush every other entry and still not fit
+            if key in self.cache:
+                self._remove(key)
+            return
+
+        ttl, soft_ttl = self._ttls_for(key[0])
+        now = monotonic()
+        if self._expiry:
+            self._expire(now)
+
+        expiry = self._expiry.pop(key, None)
+        if expiry is not None:
+            del expiry[1][key]
+        if ttl is not None:
+            queue = self._expiry_queues.get(ttl)
+            if queue is None:
+                queue = self._expiry_queues[ttl] = OrderedDict()
+            queue[key] = None
+            self._expiry[key] = (now + ttl, queue)
+
+        if soft_ttl is not None:
+            self._stale_at[key] = now + soft_ttl
+        else:
+            self._stale_at.pop(key, None)
+
+        stats = self._stats_for(key[0])
+        if key not in self.cache:
+            if self.maxsize is not None:
+                while len(self.cache) >= self.maxsize:
+                    self._evict(self._policy.victim())
+            self._index_add(key, tags)
+            stats.inserts += 1
+            stats.entries += 1
+        else:
+            stats.bytes -= self._sizes[key]
+            self._total_bytes -= self._sizes[key]
+
+        if self._policy is not None:
+            self._policy.insert(key)
+
+        self.cache[key] = value
+        self._sizes[key] = size
+        stats.bytes += size
+        self._total_bytes += size
+        if cost:
+            self._costs[key] = cost
+        else:
+            self._costs.pop(key, None)
+
+        if self.max_bytes is not None:
+            # The new key is often the first victim itself (a fresh LFU key, an overwritten FIFO key)
+            while self._total_bytes > self.max_bytes:
+                self._evict(self._policy.victim(skip=key))
+
+    def _remove(self, key: tuple):
+        del self.cache[key]
+        expiry = self._expiry.pop(key, None)
+        if expiry is not None:
+            del expiry[1][key]
+        self._stale_at.pop(key, None)
+        self._costs.pop(key, None)
+        size = self._sizes.pop(key)
+        self._total_bytes -= size
+        stats = self._function_stats[key[0]]
+        stats.entries -= 1
+        stats.bytes -= size
+        self._index_discard(key)
+        if self._policy is not None:
+            self._policy.remove(key)
+
+    def _evict(self, key: tuple):
+        self._remove(key)
+        self._function_stats[key[0]].evictions += 1
+
+    def _index_add(self, key: tuple, tags: tuple):
+        func_name, args, kwargs = key
+        self._func_index.setdefault(func_name, {})[key] = None
+        self._args_index.setdefault((func_name, args), {})[key] = None
+        self._kwargs_index.setdefault((func_name, kwargs), {})[key] = None
+        for slot in _argument_slots(key):
+            self._argument_index.setdefault(slot, {})[key] = None
+
+        if tags:
+            self._key_tags[key] = tags
+            for tag in tags:
+                self._tag_index.setdefault(tag, {})[key] = None
+
+    def _index_discard(self, key: tuple):
+        func_name, args, kwargs = key
+        for index, index_key in ((self._func_index, func_name),
+                                 (self._args_index, (func_name, args)),
+                                 (self._kwargs_index, (func_name, kwargs))):
+            keys = index[index_key]
+            del keys[key]
+            if not keys:
+                del index[index_key]
+        for slot in _argument_slots(key):
+            keys = self._argument_index[slot]
+            del keys[key]
+            if not keys:
+                del self._argument_index[slot]
+
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tag_index[tag]
+            del keys[key]
+            if not keys:
+                del self._tag_index[tag]
+
+    def _expire(self, now: float):
+        """Remove every expired entry, only touching the entries which actually expired."""
+        for queue in self._expiry_queues.values():
+            while queue:
+                key = next(iter(queue))
+                if self._expiry[key][0] > now:
+                    break
+                self._remove(key)
+                self._stats_for(key[0]).expirations += 1
+
+    def _compute_once(self, key: tuple, compute: callable, tags: tuple = None) -> any:
+        """
+        Run `compute` and cache its result, making sure only one thread computes a given key at a time.
+
+        Threads missing on a key which is already being computed wait for that computation
+        and share its result or exception instead of running it again.
+        """
+        stripe_lock, flights = self._stripes[hash(key) % len(self._stripes)]
+        with stripe_lock:
+            flight = flights.get(key)
+            if flight is not None:
+                leader = False
+            else:
+                # The previous leader may have stored the result between our lookup and taking the stripe lock
+                with self._lock:
+                    result = self._lookup(key)
+                if result is not _MISSING:
+                    return result
+
+                leader = True
+                flight = flights[key] = _Flight()
+
+        if not leader:
+            return flight.wait()
+
+        try:
+            start_time = perf_counter()
+            flight.result = compute()
+            self._save(key, flight.result, perf_counter() - start_time, tags)
+            return flight.result
+        except BaseException as exc:
+            flight.exception = exc
+            raise
+        finally:
+            with stripe_lock:
+                del flights[key]
+            flight.done.set()
+
+    async def _compute_once_async(self, key: tuple, compute: callable, tags: tuple = None) -> any:
+        """
+        Await `compute()` in a task shared by every coroutine missing on `key` and cache its result.
+
+        Cancelling one awaiter does not affect the others, the shared task is only cancelled
+        once every coroutine awaiting it has been cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flights = self._async_flights.get(loop)
+            if flights is None:
+                flights = self._async_flights[loop] = {}
+
+        flight = flights.get(key)
+        if flight is None:
+            flight = flights[key] = _AsyncFlight(loop.create_task(self._run_async(key, compute, tags)))
+            flight.task.add_done_callback(lambda _: flights.pop(key, None))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    async def _run_async(self, key: tuple, compute: callable, tags: tuple) -> any:
+        start_time = perf_counter()
+        result = await compute()
+        await self._save_async(key, result, perf_counter() - start_time, tags)
+        return result
+
+    def _make_key(self, func_name: callable, args: tuple, kwargs: dict) -> tuple:
+        """Build the key of a call, functions get signature normalized keys while names are used as they are."""
+        key_builder = _key_builder_for(func_name) if callable(func_name) else None
+        try:
+            key = key_builder(args, kwargs) if key_builder else (func_name, args, frozenset(kwargs.items()))
+            hash(key)
+            return key
+        except TypeError:
+            if key_builder:
+                return key_builder.fingerprinted(args, kwargs, self._fingerprint)
+            return _fingerprint_key(func_name, args, kwargs, self._fingerprint)
+
     def manual_cache(self, func_name: callable, return_value: any, *args, **kwargs):
         """Manually add a result to the cache.
 
-        :param func_name: The name of the function whose result is being cached.
+        :param func_name: The function (or the name of the function) whose result is being cached.
         :param return_value: The result to cache.
         :param args: Positional arguments used to generate the cache key.
         :param kwargs: Keyword arguments used to generate the cache key.
         """
-        key = (func_name, args, frozenset(kwargs.items()))
-        self.cache[key] = return_value
+        tags = self._call_tags(_key_builder_for(func_name), args, kwargs) if callable(func_name) else None
+        self._save(self._make_key(func_name, args, kwargs), return_value, tags=tags)
 
     def get_cached_value(self, func_name: callable, *args,  compare_all: bool = True, **kwargs) -> any:
         """
@@ -56,10 +905,15 @@ class Cache:
         `func_name`, `args`, and `kwargs`. It can either look for an exact match
         or allow for partial matches depending on the `compare_all` flag.
 
-        :param func_name: The name of the function whose result is being retrieved.
+        :param func_name: The function (or the name of the function) whose result is being retrieved.
+                          Functions decorated by `cache_func` are stored under their qualified name,
+                          passing the function itself also normalizes `args` and `kwargs`: exact matches
+                          fill in the defaults, partial matches compare every given argument with the
+                          parameter it binds to, whether it was passed by position or by keyword.
 
         :keyword compare_all: If True, requires an exact match of `func_name`, `args`, and `kwargs`.
-                            If False, allows partial matches where `args` and/or `kwargs` can be omitted.
+                            If False, allows partial matches where `args` and/or `kwargs` can be omitted,
+                            partial matches only search the entries held in memory.
 
         :param args: Positional arguments used to generate the cache key.
                      If provided, they are used for partial matching when `compare_all` is False.
@@ -75,33 +929,262 @@ class Cache:
 
         3. None if no match is found.
         """
-        return (self.cache.get((func_name, args, frozenset(kwargs.items())), None)
-                if compare_all
-                else [result for key, result in self.cache.items()
-                      if key[0] == func_name
-                      and (args == key[1] or not args)
-                      and (frozenset(kwargs.items()) == key[2] or not kwargs)])
+        if compare_all:
+            result = self._get(self._make_key(func_name, args, kwargs))
+            return None if result is _MISSING else result
 
+        query = None
+        if callable(func_name):
+            key_builder = _key_builder_for(func_name)
+            func_name = key_builder.name
+            query = key_builder.bind_partial(args, kwargs)
+
+        with self._lock:
+            if self._expiry:
+                self._expire(monotonic())
+
+            if query is not None:
+                slots = [(func_name, slot, self._fingerprint(value))
+                         for slot, value in (*query[0].items(), *query[1].items())]
+                if slots:
+                    # Only the keys of the rarest argument are checked against the other arguments
+                    matches = sorted((self._argument_index.get(slot, {}) for slot in slots), key=len)
+                    keys = [key for key in matches[0] if all(key in others for others in matches[1:])]
+                else:
+                    keys = self._func_index.get(func_name, ())
+            else:
+                _, args, kwargs = _fingerprint_key(func_name, args, kwargs, self._fingerprint)
+                if args and kwargs:
+                    key = (func_name, args, kwargs)
+                    keys = (key,) if key in self.cache else ()
+                elif args:
+                    keys = self._args_index.get((func_name, args), ())
+                elif kwargs:
+                    keys = self._kwargs_index.get((func_name, kwargs), ())
+                else:
+                    keys = self._func_index.get(func_name, ())
 
-    def cache_func(self, func: callable) -> callable:
+            values = [self.cache[key] for key in keys]
+            if self.weak_values:
+                # Dead references are skipped here and dropped by the next exact lookup of their key
+                values = [self._unwrap(value) for value in values
+                          if type(value) is not _WeakValue or value() is not None]
+            return values
+
+
+    def cache_func(
+            self,
+            func: callable = None,
+            *,
+            soft_ttl: float = None,
+            hard_ttl: float = None,
+            tags: any = None
+    ) -> callable:
         """Decorator to cache the result of a function call.
 
         If the function is called with the same arguments, the cached 
         result will be returned instead of calling the function again.
 
+        Arguments are bound to the signature of the function, so passing an argument by position
+        or by keyword results in the same entry.
+        Coroutine functions get an async wrapper which caches the awaited result.
+        Generator results are cached lazily, every call gets an iterator over the shared item buffer.
+        Only the items pulled when the entry is stored count towards `max_bytes`, and such entries are never
+        written to the disk or shared tiers.
+
+        Can be used as `@cache.cache_func` or, to pass keywords, as `@cache.cache_func(soft_ttl=...)`.
+
         :param func: The function to be cached.
+        :keyword float soft_ttl: Seconds after which an entry is stale: it is still returned immediately,
+                                 but recomputed in the background (once per key) so the next call gets a fresh value.
+                                 A cache which is not `thread_safe` starts locking its entries, as the
+                                 background refreshes store into it concurrently.
+        :keyword float hard_ttl: Seconds after which an entry expires and callers wait for the recomputation,
+                                 defaults to the `ttl` of the cache.
+        :keyword tags: A tag, an iterable of tags or a callable receiving the bound arguments of a call and
+                       returning its tags. Entries are removed by `invalidate_tags` with any of their tags.
         :return: The wrapper function that handles caching.
+
+        :raises ValueError: If `soft_ttl` or `hard_ttl` is less than or equal to 0 or `soft_ttl` is not below `hard_ttl`.
         """
+        if soft_ttl is not None and soft_ttl <= 0:
+            raise ValueError("soft_ttl must be None or > 0")
+        if hard_ttl is not None and hard_ttl <= 0:
+            raise ValueError("hard_ttl must be None or > 0")
+        if soft_ttl is not None and hard_ttl is not None and soft_ttl >= hard_ttl:
+            raise ValueError("soft_ttl must be smaller than hard_ttl")
+
+        if func is None:
+            return lambda func: self.cache_func(func, soft_ttl=soft_ttl, hard_ttl=hard_ttl, tags=tags)
+
+        key_builder = _KeyBuilder(func)
+        stats = self._stats_for(key_builder.name)
+        self._register_tags(key_builder.name, tags)
+        # Tags are computed from the actual arguments, the key of an unhashable call only holds their fingerprints
+        call_tags = partial(self._call_tags, key_builder) if tags is not None else None
+        if soft_ttl is not None and not self.thread_safe and type(self._lock) is nullcontext:
+            # Stale entries are refreshed on background threads storing into the cache while the caller reads it
+            self._lock = RLock()
+        if soft_ttl is not None or hard_ttl is not None:
+            with self._lock:
+                self._function_ttls[key_builder.name] = (hard_ttl if hard_ttl is not None else self.ttl, soft_ttl)
+
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> any:
+                try:
+                    key = key_builder(args, kwargs)
+                    result = await self._get_async(key)
+                except TypeError:
+                    key = key_builder.fingerprinted(args, kwargs, self._fingerprint)
+                    result = await self._get_async(key, call_tags and (lambda: call_tags(args, kwargs)))
+                if result is not _MISSING:
+                    stats.hits += 1
+                    stats.time_saved += self._costs.get(key, 0.0)
+                    if soft_ttl is not None and self._is_stale(key):
+                        self._refresh_async(key, lambda: func(*args, **kwargs), call_tags and call_tags(args, kwargs))
+                    return result
+
+                stats.misses += 1
+                return await self._compute_once_async(
+                    key, lambda: func(*args, **kwargs), call_tags and call_tags(args, kwargs)
+                )
+
+            async_wrapper._cache_key_builder = key_builder
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> any:
-            key = (func.__name__, args, frozenset(kwargs.items()))
+            try:
+                key = key_builder(args, kwargs)
+                result = self._get(key)
+            except TypeError:
+                # Unhashable arguments only pay for fingerprinting once hashing the plain key failed
+                key = key_builder.fingerprinted(args, kwargs, self._fingerprint)
+                result = self._get(key, call_tags and (lambda: call_tags(args, kwargs)))
+            if result is not _MISSING:
+                stats.hits += 1
+                stats.time_saved += self._costs.get(key, 0.0)
+                if soft_ttl is not None and self._is_stale(key):
+                    self._refresh(
+                        key, lambda: self._replayable(key, func(*args, **kwargs)), call_tags and call_tags(args, kwargs)
+                    )
+                return iter(result) if type(result) is _ReplayBuffer else result
 
-            if key in self.cache:
-                return self.cache[key]
+            stats.misses += 1
+            tags = call_tags and call_tags(args, kwargs)
+            if self.thread_safe:
+                result = self._compute_once(key, lambda: self._replayable(key, func(*args, **kwargs)), tags)
             else:
-                result = func(*args, **kwargs)
+                start_time = perf_counter()
+                result = self._replayable(key, func(*args, **kwargs))
+                self._save(key, result, perf_counter() - start_time, tags)
+            return iter(result) if type(result) is _ReplayBuffer else result
 
-            self.cache[key] = result
-            return result
-        
-        return wrapper
\ No newline at end of file
+        wrapper._cache_key_builder = key_builder
+        return wrapper
+
+    def cache_batch(self, func: callable = None, *, tags: any = None) -> callable:
+        """Decorator caching a batch function item by item.
+
+        The decorated function takes a list of items as its first argument and returns one result per item,
+        either as a list in the order of the items or as a dict mapping each item to its result.
+        Every item is cached under its own key, as if the function had been called with that single item
+        (and the same remaining arguments), and the function is only called with the items missing from the cache.
+        The results are returned as a list in the order of the requested items.
+
+        :param func: The batch function to be cached.
+        :keyword tags: Tags of the entries like in `cache_func`, a tag callable receives the single item call.
+        :return: The wrapper function that handles caching.
+
+        :raises ValueError: If the decorated function returns a list whose length doesn't match the missing items.
+        """
+        if func is None:
+            return lambda func: self.cache_batch(func, tags=tags)
+
+        key_builder = _KeyBuilder(func)
+        stats = self._stats_for(key_builder.name)
+        self._register_tags(key_builder.name, tags)
+        call_tags = partial(self._call_tags, key_builder) if tags is not None else None
+
+        def split(args: tuple, kwargs: dict, tiers: bool = True) -> tuple:
+            """Bind the call and look every item up, returns the bound call, the results and the missing items."""
+            args, kwargs = key_builder.bind(args, kwargs)
+            items, rest = args[0], args[1:]
+            frozen_kwargs = frozenset(kwargs.items())
+
+            results = []
+            missing = {}
+            for item in items:
+                try:
+                    key = (key_builder.name, (item,) + rest, frozen_kwargs)
+                    result = self._get(key, tiers=tiers)
+                except TypeError:
+                    key = _fingerprint_key(key_builder.name, (item,) + rest, kwargs, self._fingerprint)
+                    result = self._get(key, call_tags and (lambda item=item: call_tags((item,) + rest, kwargs)), tiers)
+
+                if result is _MISSING:
+                    # Duplicated items are only computed once
+                    missing.setdefault(key, item)
+                results.append((key, result))
+            return rest, kwargs, results, missing
+
+        def merge(missing: dict, computed: any, cost: float, rest: tuple, kwargs: dict, tiers: bool = True) -> dict:
+            """Cache the computed results of the missing items, returns them by key."""
+            if isinstance(computed, Mapping):
+                computed = [computed[item] for item in missing.values()]
+            elif len(computed) != len(missing):
+                raise ValueError(f"{key_builder.name} returned {len(computed)} results for {len(missing)} items")
+
+            computed_by_key = dict(zip(missing, computed))
+            for key, value in computed_by_key.items():
+                tags = call_tags and call_tags((missing[key],) + rest, kwargs)
+                self._save(key, value, cost / len(computed_by_key), tags, tiers)
+            return computed_by_key
+
+        def ordered(results: list, computed_by_key: dict) -> list:
+            """Return every result in input order."""
+            return [computed_by_key[key] if result is _MISSING else result for key, result in results]
+
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> list:
+                rest, bound_kwargs, results, missing = split(args, kwargs, tiers=False)
+                loop = asyncio.get_running_loop()
+                if missing and self._tiers:
+                    # The tiers are read in the default executor of the loop, in one go for the items missing from memory
+                    found = await loop.run_in_executor(None, lambda: {key: self._read_tiers(key) for key in missing})
+                    for key, value in found.items():
+                        if value is not _MISSING:
+                            item = missing.pop(key)
+                            self._promote(key, value, call_tags and (lambda: call_tags((item,) + rest, bound_kwargs)))
+                    results = [(key, found[key] if result is _MISSING else result) for key, result in results]
+                stats.hits += len(results) - len(missing)
+                stats.misses += len(missing)
+                if not missing:
+                    return [result for _, result in results]
+
+                start_time = perf_counter()
+                computed = await func(list(missing.values()), *rest, **bound_kwargs)
+                computed_by_key = merge(missing, computed, perf_counter() - start_time, rest, bound_kwargs, tiers=False)
+                if self._tiers:
+                    await loop.run_in_executor(None, self._write_tiers, computed_by_key)
+                return ordered(results, computed_by_key)
+
+            async_wrapper._cache_key_builder = key_builder
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> list:
+            rest, bound_kwargs, results, missing = split(args, kwargs)
+            stats.hits += len(results) - len(missing)
+            stats.misses += len(missing)
+            if not missing:
+                return [result for _, result in results]
+
+            start_time = perf_counter()
+            computed = func(list(missing.values()), *rest, **bound_kwargs)
+            return ordered(results, merge(missing, computed, perf_counter() - start_time, rest, bound_kwargs))
+
+        wrapper._cache_key_builder = key_builder
+        return wrapper
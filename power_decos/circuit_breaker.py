@@ -0,0 +1,205 @@
+"""
+A module containing the circuit breaker used by the `retry` decorator to stop calling a dependency which is down.
+
+Classes
+=======
+
+- `CircuitBreaker`: Tracks the outcome of the recent calls to a dependency and rejects calls while it is failing.
+
+    - closed: calls go through, the breaker opens once the failure rate of the last `window` calls
+      reaches `failure_threshold` (after at least `min_calls` calls).
+    - open: calls are rejected without being made, after `reset_timeout` seconds the breaker turns half-open.
+    - half-open: up to `half_open_probes` calls are let through as probes, the breaker closes once that many
+      succeeded and opens again as soon as one of them fails.
+
+- `CircuitOpenError`: Raised for calls rejected by an open breaker.
+
+Exception classes
+=================
+
+- `CircuitOpenError`: Raised by `retry` when the breaker of a function is open and no fallback is given.
+
+How To Use This Module
+======================
+
+1. Pass a breaker to `retry`, either one per decorated function or one shared by name:
+
+       @retry(retries=3, delay=0.5, circuit_breaker=True)
+       def get_user():
+           pass
+
+       @retry(retries=3, delay=0.5, circuit_breaker="payments", fallback=lambda *args, **kwargs: None)
+       def charge():
+           pass
+
+2. Or create and configure a breaker yourself:
+
+       breaker = CircuitBreaker.named("payments", failure_threshold=0.25, reset_timeout=10)
+
+       if breaker.allow():
+           try:
+               call_dependency()
+           except Exception:
+               breaker.record_failure()
+           else:
+               breaker.record_success()
+"""
+
+from threading import Lock
+from time import monotonic
+
+_CLOSED, _OPEN, _HALF_OPEN = "closed", "open", "half_open"
+
+# name -> CircuitBreaker, named breakers are shared by every function of the process using that name
+_breakers = {}
+_breakers_lock = Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because its circuit breaker is open."""
+    def __init__(self, name: str):
+        super().__init__(f"Circuit breaker '{name}' is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker with a failure-rate window over the last calls.
+
+    The closed state costs a single attribute check per call, and successes are not even recorded
+    while the window holds no failure. The outcomes of the last `window` calls are kept in a ring buffer.
+    """
+    def __init__(
+            self,
+            name: str = None,
+            failure_threshold: float = 0.5,
+            window: int = 20,
+            min_calls: int = 5,
+            reset_timeout: float = 30,
+            half_open_probes: int = 1
+    ):
+        """
+        :keyword str name: Name of the breaker, used in `CircuitOpenError` messages.
+        :keyword float failure_threshold: Failure rate (0 < rate <= 1) of the window at which the breaker opens.
+        :keyword int window: Number of most recent calls the failure rate is computed over.
+        :keyword int min_calls: Number of calls the window needs before the breaker can open.
+        :keyword float reset_timeout: Seconds the breaker stays open before letting probes through.
+        :keyword int half_open_probes: Number of probe calls let through at once, and needed to close the breaker.
+
+        :raises ValueError: If `failure_threshold` is not in (0, 1], `window`, `min_calls` or `half_open_probes`
+                            is less than 1, `min_calls` is larger than `window` or `reset_timeout` is negative.
+        """
+        if not 0 < failure_threshold <= 1:
+            raise ValueError("failure_threshold must be > 0 and <= 1")
+        if window < 1 or min_calls < 1 or half_open_probes < 1:
+            raise ValueError("window, min_calls and half_open_probes must be >= 1")
+        if min_calls > window:
+            raise ValueError("min_calls must be <= window")
+        if reset_timeout < 0:
+            raise ValueError("reset_timeout must be >= 0")
+
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+
+        self._lock = Lock()
+        self._state = _CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._reset_window()
+
+    @classmethod
+    def named(cls, name: str, **kwargs) -> "CircuitBreaker":
+        """Return the breaker registered under `name`, creating it with `kwargs` if it does not exist yet."""
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = cls(name, **kwargs)
+            return breaker
+
+    @property
+    def state(self) -> str:
+        """The current state: "closed", "open" or "half_open"."""
+        if self._state is _OPEN and monotonic() >= self._opened_at + self.reset_timeout:
+            return _HALF_OPEN
+        return self._state
+
+    def _reset_window(self):
+        self._outcomes = bytearray(self.window)
+        self._index = 0
+        self._calls = 0
+        self._failures = 0
+
+    def _push(self, failed: int):
+        """Add an outcome to the window, replacing the oldest one once it is full."""
+        if self._calls == self.window:
+            self._failures -= self._outcomes[self._index]
+        else:
+            self._calls += 1
+        self._outcomes[self._index] = failed
+        self._failures += failed
+        self._index = (self._index + 1) % self.window
+
+    def _open(self):
+        self._state = _OPEN
+        self._opened_at = monotonic()
+
+    def allow(self) -> bool:
+        """Return whether a call may be made now, every allowed call has to be followed by one `record_*`/`release` call."""
+        if self._state is _CLOSED:
+            return True
+
+        with self._lock:
+            if self._state is _OPEN:
+                if monotonic() < self._opened_at + self.reset_timeout:
+                    return False
+                self._state = _HALF_OPEN
+                self._probes = self._probe_successes = 0
+
+            if self._state is _HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def record_success(self):
+        """Record a successful call."""
+        if self._state is _CLOSED and not self._failures and self._calls == self.window:
+            # The window only holds successes, another one changes nothing
+            return
+
+        with self._lock:
+            if self._state is _CLOSED:
+                self._push(0)
+            elif self._state is _HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._state = _CLOSED
+                    self._reset_window()
+
+    def record_failure(self):
+        """Record a failed call, opening the breaker if the failure rate reaches the threshold."""
+        with self._lock:
+            if self._state is _CLOSED:
+                self._push(1)
+                if self._calls >= self.min_calls and self._failures >= self.failure_threshold * self._calls:
+                    self._open()
+            elif self._state is _HALF_OPEN:
+                self._open()
+
+    def release(self):
+        """End an allowed call without recording an outcome, e.g. when it failed for an unrelated reason."""
+        if self._state is _HALF_OPEN:
+            with self._lock:
+                self._probes = max(self._probes - 1, 0)
+
+    def reset(self):
+        """Close the breaker and forget every recorded outcome."""
+        with self._lock:
+            self._state = _CLOSED
+            self._reset_window()
@@ -0,0 +1,100 @@
+"""
+A module containing the retry budget shared by `retry` decorated functions to prevent retry storms.
+
+Classes
+=======
+
+- `RetryBudget`: A token bucket every retry has to take a token from, refilled by a fraction of the successful calls.
+
+    When a dependency struggles, its callers run out of tokens and surface failures at once instead of
+    multiplying the traffic by the number of retries. Once calls succeed again the bucket refills.
+
+How To Use This Module
+======================
+
+1. Share a budget between every function calling the same dependency by giving it a name:
+
+       @retry(retries=3, delay=0.5, budget="payments")
+       def charge():
+           pass
+
+       @retry(retries=5, delay=0.5, budget="payments")
+       def refund():
+           pass
+
+2. Or configure the budget before the functions using it are decorated:
+
+       RetryBudget.named("payments", ratio=0.2, max_tokens=50)
+"""
+
+from threading import Lock
+
+# name -> RetryBudget, named budgets are shared by every function of the process using that name
+_budgets = {}
+_budgets_lock = Lock()
+
+
+class RetryBudget:
+    """
+    A token bucket holding at most `max_tokens` retries, every successful call adds `ratio` tokens.
+
+    Successes are counted with a plain increment and only folded into the bucket when a retry asks for a token,
+    so the success path takes no lock. Concurrent increments may slightly undercount the successes,
+    which only ever makes the budget stricter.
+    """
+    def __init__(self, name: str = None, ratio: float = 0.1, max_tokens: float = 10):
+        """
+        :keyword str name: Name of the budget.
+        :keyword float ratio: Tokens added per successful call, 0.1 allows one retry per ten successful calls.
+        :keyword float max_tokens: Capacity of the bucket, the bucket starts full.
+
+        :raises ValueError: If `ratio` is negative or `max_tokens` is less than 1.
+        """
+        if ratio < 0:
+            raise ValueError("ratio must be >= 0")
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be >= 1")
+
+        self.name = name
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+
+        self._lock = Lock()
+        self._tokens = max_tokens
+        self._successes = 0
+        self._folded_successes = 0
+
+    @classmethod
+    def named(cls, name: str, **kwargs) -> "RetryBudget":
+        """Return the budget registered under `name`, creating it with `kwargs` if it does not exist yet."""
+        with _budgets_lock:
+            budget = _budgets.get(name)
+            if budget is None:
+                budget = _budgets[name] = cls(name, **kwargs)
+            return budget
+
+    @property
+    def tokens(self) -> float:
+        """The number of retries currently available."""
+        with self._lock:
+            self._fold()
+            return self._tokens
+
+    def _fold(self):
+        """Add the tokens earned by the successes counted since the last fold, the lock has to be held."""
+        successes = self._successes
+        self._tokens = min(self.max_tokens, self._tokens + (successes - self._folded_successes) * self.ratio)
+        self._folded_successes = successes
+
+    def record_success(self):
+        """Record a successful call."""
+        self._successes += 1
+
+    def withdraw(self) -> bool:
+        """Take the token of one retry, returns False without taking anything if the budget is exhausted."""
+        with self._lock:
+            self._fold()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
@@ -4,22 +4,51 @@ A module containing the retry decorator for handling function retries on excepti
 Decorators
 ==========
 
-- `retry`: Re-executes a function upon encountering specific exceptions, with a configurable number of retries and delay between attempts.
+- `retry`: Re-executes a function upon encountering specific exceptions, with a configurable number of retries, backoff between attempts and overall deadline.
+- `retry_batch`: Re-executes a batch function with only the items which failed.
 
 Functions
 =========
 
 - `retry`: The main decorator function that enables retry functionality.
 
-    - `retries`: Number of retry attempts (default is 3).
-    - `delay`: Delay in seconds between retry attempts (default is 1).
+    - `retries`: Number of retry attempts (default is 3), None retries until the `deadline` is reached.
+    - `delay`: Delay in seconds between retry attempts (default is 1), the base delay of the backoff strategies.
     - `raise_exception`: Whether to raise the exception after the final retry (default is False).
     - `exception_types`: The exception(s) that should trigger a retry. Can be a single type or a tuple of types.
+    - `backoff`: How the delay grows between attempts: "fixed" (default), "exponential", "full_jitter",
+      "decorrelated_jitter" or a callable `(attempt, previous_delay) -> delay`.
+    - `max_delay`: Upper bound of a single delay.
+    - `deadline`: Total time budget in seconds, no retry is started once its delay would exceed the budget.
+    - `circuit_breaker`: A `CircuitBreaker`, the name of a shared breaker or True for a breaker of the function.
+    - `fallback`: Called with the arguments of a call instead of the function while its breaker is open.
+    - `budget`: A `RetryBudget` or the name of a shared one, retries are skipped once it is exhausted.
+    - `hedge_after`: Latency in seconds (or a learned percentile like "p95") after which a duplicate attempt is
+      launched, the first successful duplicate wins.
+    - `max_hedges`: Maximum number of duplicates launched per attempt (default is 1).
+    - `attempt_timeout`: Seconds after which an attempt is abandoned and counts as failed with a `TimeoutError`.
+    - `max_abandoned`: Maximum number of abandoned (timed out or losing hedged) sync attempts still running
+      in the background (default is 8).
+    - `on_retry`: Called with (attempt, exception, delay) before every retry.
+    - `on_giveup`: Called with (attempt, exception) once the function gives up.
+    - `log`: Whether retries and give-ups are logged (default is False), successful calls are never logged.
+
+    Every decorated function counts its calls, attempts, retries, exhausted calls and time spent sleeping,
+    `func.stats()` returns the counters and `func.reset_stats()` resets them.
+
+- `retry_batch`: Retries the failed items of a function taking a list of items and returning one result per item.
+
+    - `failed_items`: Callable `(items, result_or_exception) -> positions` identifying the items to retry.
+    - `retries`, `delay`, `raise_exception`, `exception_types`, `backoff`, `max_delay`, `deadline`, `log`: as for `retry`.
+
+    Coroutine functions get an async wrapper which awaits every attempt and backs off with `asyncio.sleep`,
+    so retries never block the event loop. Cancelling the wrapper cancels the running attempt or backoff.
 
 Exception classes
 =================
 
-This module does not define any specific exception classes.
+This module does not define any specific exception classes,
+calls rejected by an open circuit breaker raise `circuit_breaker.CircuitOpenError`.
 
 How To Use This Module
 ======================
@@ -35,6 +64,12 @@ How To Use This Module
 
 3. Customize the retry behavior by adjusting the keyword arguments `retries`, `delay`, `raise_exception`, and `exception_types` as needed.
 
+4. Use a jittered backoff so many clients don't retry a failing dependency in lockstep:
+
+       @retry(retries=None, delay=0.1, backoff="full_jitter", max_delay=5, deadline=30)
+       def call_dependency():
+           pass
+
 Example
 =======
 
@@ -49,53 +84,445 @@ def unreliable_function():
 unreliable_function()
 """
 
-from time import sleep
+from time import monotonic, sleep
 from functools import wraps
+from inspect import isawaitable, iscoroutinefunction
+from typing import Callable
+import asyncio
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from ._retry_backoff import _resolve_backoff
+from ._retry_hedging import _Hedger
+from ._retry_pool import _AttemptPool
+from ._retry_timeout import _AttemptTimeout
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .retry_budget import RetryBudget
+
 logger = logging.getLogger(__name__)
 
+
+class _RetryStats:
+    """
+    Counters of a single decorated function.
+
+    The counters are plain attributes incremented without any lock, so they cost next to nothing
+    on the success path but may slightly undercount when many threads call the same function at once.
+    """
+    __slots__ = ("calls", "attempts", "retries", "exhausted", "sleep_time")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        for counter in self.__slots__:
+            setattr(self, counter, 0)
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _check_arguments(
+    retries: int | None,
+    delay: float,
+    exception_types: BaseException | tuple[BaseException],
+    max_delay: float,
+    deadline: float
+):
+    """Validate the arguments shared by `retry` and `retry_batch`."""
+    if (retries is not None and retries < 1) or delay <= 0:
+        raise ValueError("Arguments are wrong! retries >= 1; delay > 0")
+    if retries is None and deadline is None:
+        raise ValueError("retries can only be None when a deadline is given")
+    if max_delay is not None and max_delay <= 0:
+        raise ValueError("max_delay must be None or > 0")
+    if deadline is not None and deadline <= 0:
+        raise ValueError("deadline must be None or > 0")
+
+    if not isinstance(exception_types, (type, tuple)):
+        raise TypeError("Exception(s) passed is not a type or a tuple of types.")
+
+
 def retry(
-    retries: int = 3,
+    retries: int | None = 3,
     delay: float = 1,
     raise_exception: bool = False,
-    exception_types: BaseException | tuple[BaseException] = Exception
+    exception_types: BaseException | tuple[BaseException] = Exception,
+    backoff: str | Callable = "fixed",
+    max_delay: float = None,
+    deadline: float = None,
+    circuit_breaker: CircuitBreaker | str | bool = None,
+    fallback: callable = None,
+    budget: RetryBudget | str = None,
+    hedge_after: float | str = None,
+    max_hedges: int = 1,
+    attempt_timeout: float = None,
+    max_abandoned: int = 8,
+    on_retry: callable = None,
+    on_giveup: callable = None,
+    log: bool = False
 ) -> callable:
     """
     Reexecutes a function upon encountering an exception.
 
-    :keyword int retries: Number of times the function should retry upon encountering an exception.
-    :keyword float delay: Time in seconds to wait between retry attempts.
+    :keyword int retries: Number of times the function should retry upon encountering an exception,
+                          None keeps retrying until the `deadline` is reached.
+    :keyword float delay: Time in seconds to wait between retry attempts, the base delay of the `backoff` strategy.
     :keyword bool raise_exception: Whether to raise the exception after exhausting all retries.
     :keyword exception_types: Exception types that should trigger a retry. Can be a single type or a tuple of types.
+    :keyword backoff: How the delay changes between attempts: "fixed", "exponential" (doubling `delay`),
+                      "full_jitter" (random between 0 and the exponential delay), "decorrelated_jitter"
+                      (random between `delay` and three times the previous delay) or a callable receiving
+                      the failed attempt number and the previous delay and returning the next delay.
+    :keyword float max_delay: Upper bound of a single delay, None means unbounded.
+    :keyword float deadline: Time in seconds after the first attempt past which no retry is started,
+                             the function gives up as soon as the next delay would exceed it.
+    :keyword circuit_breaker: A `CircuitBreaker` instance, the name of a breaker shared through `CircuitBreaker.named`
+                              or True to give the decorated function its own breaker. Every attempt is recorded
+                              by the breaker, and while it is open calls are rejected without invoking the function.
+    :keyword fallback: Called with the arguments of a rejected call, its result is returned instead.
+                       The result of an async fallback is awaited when the decorated function is a coroutine.
+                       Without a fallback rejected calls raise `CircuitOpenError` if `raise_exception`
+                       is True and return None otherwise.
+    :keyword budget: A `RetryBudget`, or the name of a budget shared through `RetryBudget.named`.
+                     Every retry takes a token and every successful call refills a fraction of one,
+                     once the budget is exhausted failures are surfaced at once instead of being retried.
+    :keyword hedge_after: Seconds after which an attempt which has not finished yet gets a speculative duplicate,
+                          or a percentile like "p95" to learn the threshold from the latencies of the recent
+                          successful attempts of the function (no attempt is hedged until enough were recorded).
+                          Duplicates of sync functions run on a thread pool of the function and losers still
+                          running are abandoned, duplicates of coroutine functions run as tasks and losers
+                          are cancelled.
+                          An attempt only fails once every duplicate failed.
+    :keyword int max_hedges: Maximum number of duplicates launched per attempt.
+    :keyword float attempt_timeout: Seconds after which an attempt is abandoned, it then fails with a `TimeoutError`
+                                    (retried if `exception_types` matches it, which the default does).
+                                    Sync attempts run on a thread pool of the function, coroutines are cancelled
+                                    by `asyncio.wait_for`.
+    :keyword int max_abandoned: Maximum number of timed out or losing hedged sync attempts of the function which may
+                                still be running in the background. Further attempts with a timeout fail at once
+                                and further hedged attempts are not hedged until some of them finish.
+    :keyword on_retry: Called with the failed attempt number, its exception and the delay before every retry.
+    :keyword on_giveup: Called with the last attempt number and its exception once the function gives up.
+    :keyword bool log: Log retries as warnings and give-ups as errors through the module logger.
+                       Messages are only formatted if the logger handles them, successful calls are never logged.
+
+    The wrapper counts the calls, attempts, retries, exhausted calls and seconds spent sleeping of the function,
+    `wrapper.stats()` returns them as a dict and `wrapper.reset_stats()` resets them.
 
-    :raises ValueError: If `retries` is less than 1 or `delay` is less than or equal to 0.
+    Coroutine functions are retried by an async wrapper sleeping with `asyncio.sleep`,
+    `asyncio.CancelledError` is never retried even if it matches `exception_types`.
+
+    :raises ValueError: If `retries`, `max_hedges` or `max_abandoned` is less than 1, `delay`, `max_delay`,
+                        `deadline`, `hedge_after` or `attempt_timeout` is less than or equal to 0,
+                        `retries` is None without a `deadline` or `backoff` is unknown.
     :raises TypeError: If `exception_types` is not a type or a tuple of types.
     """
-    if retries < 1 or delay <= 0:
-        raise ValueError("Arguments are wrong! retries >= 1; delay > 0")
+    _check_arguments(retries, delay, exception_types, max_delay, deadline)
+    if max_hedges < 1:
+        raise ValueError("max_hedges must be >= 1")
+    if attempt_timeout is not None and attempt_timeout <= 0:
+        raise ValueError("attempt_timeout must be None or > 0")
+    if max_abandoned < 1:
+        raise ValueError("max_abandoned must be >= 1")
+    if hedge_after is not None:
+        # Validates `hedge_after`, every decorated function gets its own hedger learning its own latencies
+        _Hedger(hedge_after, max_hedges)
 
-    if not isinstance(exception_types, (type, tuple)):
-        raise TypeError("Exception(s) passed is not a type or a tuple of types.")
+    next_delay = _resolve_backoff(backoff, delay, max_delay)
+    if isinstance(budget, str):
+        budget = RetryBudget.named(budget)
+
+    def next_wait(
+            func: callable,
+            stats: _RetryStats,
+            attempt: int,
+            start_time: float,
+            previous_delay: float,
+            exc: BaseException
+    ) -> float | None:
+        """Return the delay before the next attempt, or None once the retries, the deadline or the budget are exhausted."""
+        if attempt != retries:
+            wait = next_delay(attempt, previous_delay)
+            if deadline is None or monotonic() - start_time + wait < deadline:
+                if budget is None or budget.withdraw():
+                    stats.retries += 1
+                    stats.sleep_time += wait
+                    if on_retry is not None:
+                        on_retry(attempt, exc, wait)
+                    if log:
+                        logger.warning("Retrying '%s' in %.3fs after attempt %d failed: %r",
+                                       func.__qualname__, wait, attempt, exc)
+                    return wait
+                if log:
+                    logger.warning("Retry budget '%s' is exhausted, not retrying '%s'", budget.name, func.__qualname__)
+        return None
+
+    def give_up(func: callable, stats: _RetryStats, attempt: int, exc: BaseException):
+        stats.exhausted += 1
+        if on_giveup is not None:
+            on_giveup(attempt, exc)
+        if log:
+            logger.error("'%s' failed after %d attempts: %r", func.__qualname__, attempt, exc)
+        if raise_exception:
+            raise exc
+
+    def reject(breaker: CircuitBreaker, args: tuple, kwargs: dict) -> any:
+        """Handle a call rejected by an open breaker."""
+        if fallback is not None:
+            return fallback(*args, **kwargs)
+        if raise_exception:
+            raise CircuitOpenError(breaker.name)
+        if log:
+            logger.error("Circuit breaker '%s' is open", breaker.name)
+        return None
 
     def decorator(func: callable) -> callable:
+        if circuit_breaker is None or circuit_breaker is False:
+            breaker = None
+        elif circuit_breaker is True:
+            breaker = CircuitBreaker(f"{func.__module__}.{func.__qualname__}")
+        elif isinstance(circuit_breaker, str):
+            breaker = CircuitBreaker.named(circuit_breaker)
+        else:
+            breaker = circuit_breaker
+        stats = _RetryStats()
+        timeout = _AttemptTimeout(attempt_timeout, max_abandoned) if attempt_timeout is not None else None
+        # Timed out attempts and losing duplicates share the worker pool of the function
+        pool = timeout.pool if timeout is not None else _AttemptPool(max_abandoned)
+        hedger = _Hedger(hedge_after, max_hedges, pool=pool) if hedge_after is not None else None
+
+        # Hedging and timeouts wrap the plain call, the timeout bounds every duplicate of a hedged attempt together.
+        # A sync hedger waits for its duplicates on the calling thread, so no pool thread ever waits on the pool
+        if hedger is None and timeout is None:
+            call = None
+        elif timeout is None:
+            call = hedger.call_async if iscoroutinefunction(func) else hedger.call
+        elif hedger is None:
+            call = timeout.call_async if iscoroutinefunction(func) else timeout.call
+        elif iscoroutinefunction(func):
+            call = lambda func, args, kwargs: timeout.call_async(hedger.call_async, (func, args, kwargs), {})
+        else:
+            call = lambda func, args, kwargs: hedger.call(func, args, kwargs, timeout)
+
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> any:
+                stats.calls += 1
+                start_time = monotonic() if deadline is not None else 0.0
+                previous_delay = delay
+                attempt = 0
+                while True:
+                    attempt += 1
+                    if breaker is not None and not breaker.allow():
+                        result = reject(breaker, args, kwargs)
+                        # An async fallback returns a coroutine
+                        return await result if isawaitable(result) else result
+                    stats.attempts += 1
+                    try:
+                        if call is None:
+                            result = await func(*args, **kwargs)
+                        else:
+                            result = await call(func, args, kwargs)
+
+                    except asyncio.CancelledError:
+                        if breaker is not None:
+                            breaker.release()
+                        raise
+                    except exception_types as exc:
+                        if breaker is not None:
+                            breaker.record_failure()
+                        wait = next_wait(func, stats, attempt, start_time, previous_delay, exc)
+                        if wait is None:
+                            give_up(func, stats, attempt, exc)
+                            return None
+                    except BaseException:
+                        if breaker is not None:
+                            breaker.release()
+                        raise
+                    else:
+                        if breaker is not None:
+                            breaker.record_success()
+                        if budget is not None:
+                            budget.record_success()
+                        return result
+
+                    await asyncio.sleep(wait)
+                    previous_delay = wait
+
+            async_wrapper.circuit_breaker = breaker
+            async_wrapper.stats = stats.as_dict
+            async_wrapper.reset_stats = stats.reset
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> any:
-            for attempt in range(1, retries + 1):
+            stats.calls += 1
+            start_time = monotonic() if deadline is not None else 0.0
+            previous_delay = delay
+            attempt = 0
+            while True:
+                attempt += 1
+                if breaker is not None and not breaker.allow():
+                    return reject(breaker, args, kwargs)
+                stats.attempts += 1
                 try:
-                    logger.info(f"Attempt {attempt}/{retries} for function '{func.__name__}'")
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs) if call is None else call(func, args, kwargs)
 
                 except exception_types as exc:
-                    if attempt == retries:
-                        print(f"Function '{func.__name__}' failed after {retries} attempts")
-                        if raise_exception:
-                            raise exc
-                        logger.error(f"Error: {exc}")
-                    else:
-                        logger.warning(f"Retrying after exception: {exc}")
-                        sleep(delay)
+                    if breaker is not None:
+                        breaker.record_failure()
+                    wait = next_wait(func, stats, attempt, start_time, previous_delay, exc)
+                    if wait is None:
+                        give_up(func, stats, attempt, exc)
+                        return None
+                except BaseException:
+                    if breaker is not None:
+                        breaker.release()
+                    raise
+                else:
+                    if breaker is not None:
+                        breaker.record_success()
+                    if budget is not None:
+                        budget.record_success()
+                    return result
+
+                sleep(wait)
+                previous_delay = wait
+
+        wrapper.circuit_breaker = breaker
+        wrapper.stats = stats.as_dict
+        wrapper.reset_stats = stats.reset
+        return wrapper
+    return decorator
+
+
+def retry_batch(
+    failed_items: callable,
+    retries: int | None = 3,
+    delay: float = 1,
+    raise_exception: bool = False,
+    exception_types: BaseException | tuple[BaseException] = Exception,
+    backoff: str | Callable = "fixed",
+    max_delay: float = None,
+    deadline: float = None,
+    log: bool = False
+) -> callable:
+    """
+    Reexecutes a batch function with only the items which failed.
+
+    The decorated function takes a list of items as its first argument and returns a list with one result per item.
+    After every attempt `failed_items(items, outcome)` receives the items of that attempt and either the returned list
+    or the raised exception (if it matches `exception_types`), and returns the positions of the failed items in
+    `items`. Returning None marks every item as failed for an exception and none for a result. Only the failed items are passed to the
+    next attempt, and the results are merged back in the order of the original items.
+
+    :param failed_items: Callable identifying the positions of the failed items of an attempt.
+    :keyword int retries: Number of attempts, None keeps retrying until the `deadline` is reached.
+    :keyword float delay: Time in seconds to wait between attempts, the base delay of the `backoff` strategy.
+    :keyword bool raise_exception: Whether to raise the exception of the last attempt if it raised one.
+                                   Otherwise items which still failed hold the result of their last attempt,
+                                   or None if it raised.
+    :keyword exception_types: Exception types that should trigger a retry. Can be a single type or a tuple of types.
+    :keyword backoff: How the delay changes between attempts, see `retry`.
+    :keyword float max_delay: Upper bound of a single delay, None means unbounded.
+    :keyword float deadline: Time in seconds after the first attempt past which no retry is started.
+    :keyword bool log: Log retries as warnings and give-ups as errors through the module logger.
+
+    :raises ValueError: If `retries` is less than 1, `delay`, `max_delay` or `deadline` is less than or equal to 0,
+                        `retries` is None without a `deadline`, `backoff` is unknown
+                        or the function returned the wrong number of results.
+    :raises TypeError: If `exception_types` is not a type or a tuple of types.
+    """
+    _check_arguments(retries, delay, exception_types, max_delay, deadline)
+    next_delay = _resolve_backoff(backoff, delay, max_delay)
+
+    def merge(func: callable, results: list, positions: list, items: list, outcome: any) -> list:
+        """Store the results of an attempt and return the positions (in the original items) which failed."""
+        failed = failed_items(items, outcome)
+        if isinstance(outcome, BaseException):
+            failed = range(len(items)) if failed is None else failed
+        else:
+            failed = () if failed is None else failed
+            if len(outcome) != len(items):
+                raise ValueError(
+                    f"Batch function '{func.__name__}' returned {len(outcome)} results for {len(items)} items"
+                )
+            for position, result in zip(positions, outcome):
+                results[position] = result
+        return [positions[index] for index in sorted(set(failed))]
+
+    def next_wait(func: callable, attempt: int, start_time: float, previous_delay: float, failed: int) -> float | None:
+        """Return the delay before the next attempt, or None once the retries or the deadline are exhausted."""
+        if attempt != retries:
+            wait = next_delay(attempt, previous_delay)
+            if deadline is None or monotonic() - start_time + wait < deadline:
+                if log:
+                    logger.warning("Retrying %d failed items of '%s' in %.3fs", failed, func.__qualname__, wait)
+                return wait
+        return None
+
+    def give_up(func: callable, attempt: int, failed: int, exc: BaseException | None):
+        if log:
+            logger.error("'%s' failed for %d items after %d attempts", func.__qualname__, failed, attempt)
+        if raise_exception and exc is not None:
+            raise exc
+
+    def decorator(func: callable) -> callable:
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(items: list, *args, **kwargs) -> list:
+                results = [None] * len(items)
+                positions = list(range(len(items)))
+                start_time = monotonic() if deadline is not None else 0.0
+                previous_delay = delay
+                attempt = 0
+                while positions:
+                    attempt += 1
+                    batch = [items[position] for position in positions]
+                    exception = None
+                    try:
+                        outcome = await func(batch, *args, **kwargs)
+                    except exception_types as exc:
+                        outcome = exception = exc
+                    positions = merge(func, results, positions, batch, outcome)
+                    if not positions:
+                        break
+
+                    wait = next_wait(func, attempt, start_time, previous_delay, len(positions))
+                    if wait is None:
+                        give_up(func, attempt, len(positions), exception)
+                        break
+                    await asyncio.sleep(wait)
+                    previous_delay = wait
+                return results
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(items: list, *args, **kwargs) -> list:
+            results = [None] * len(items)
+            positions = list(range(len(items)))
+            start_time = monotonic() if deadline is not None else 0.0
+            previous_delay = delay
+            attempt = 0
+            while positions:
+                attempt += 1
+                batch = [items[position] for position in positions]
+                exception = None
+                try:
+                    outcome = func(batch, *args, **kwargs)
+                except exception_types as exc:
+                    outcome = exception = exc
+                positions = merge(func, results, positions, batch, outcome)
+                if not positions:
+                    break
+
+                wait = next_wait(func, attempt, start_time, previous_delay, len(positions))
+                if wait is None:
+                    give_up(func, attempt, len(positions), exception)
+                    break
+                sleep(wait)
+                previous_delay = wait
+            return results
         return wrapper
     return decorator
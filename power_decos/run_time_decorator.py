@@ -4,15 +4,31 @@ A module containing the `get_time` decorator for measuring and logging the execu
 Decorators
 ==========
 
-- `get_time`: Measures the execution time of a function and logs the duration.
+- `get_time`: Measures the execution time of a function and logs the duration or records it in a `TimingRegistry`.
 
 Functions
 =========
 
 - `get_time`: The main decorator that calculates the time a function takes to execute.
 
-    - It prints and logs the time taken by the decorated function.
+    - It logs the time taken by the decorated function at INFO level through the module logger.
+      Importing the module does not configure logging, call e.g. ``logging.basicConfig(level=logging.INFO)``
+      in the application to see the messages.
     - The execution time is logged regardless of whether the function raises an exception or not.
+    - `registry`: Record the durations in a `TimingRegistry` (True for `default_registry`) instead of logging them.
+    - `sample_every` / `sample_rate`: Only time one in N calls, or a random fraction of the calls.
+    - `slow_threshold`: Only report timed calls slower than this many seconds, together with a summary of their
+      arguments and a snippet of the calling stack (passed to `on_slow`, logged as a warning by default).
+
+Classes
+=======
+
+- `TimingRegistry`: Keeps a fixed size latency histogram per function.
+
+    - `report(reset: bool = False)`: Returns count, sum, min, max and p50/p90/p99/p999 of every function.
+    - `dump_every(interval: float, sink: callable = None)`: Periodically passes the report to `sink` (logs it by default).
+    - `stop_dumps()`: Stops the periodic dumps.
+    - `reset()`: Forgets every recorded duration.
 
 Exception classes
 =================
@@ -33,6 +49,20 @@ How To Use This Module
 
 3. The execution time will be logged with a message indicating how long the function took.
 
+4. For functions called too often to log every call, aggregate the durations instead:
+
+       @get_time(registry=True)
+       def hot_function():
+           pass
+
+       default_registry.report()["my_module.hot_function"]["p99"]
+
+5. To leave the decorator on hot functions permanently, sample the calls and only report the outliers:
+
+       @get_time(sample_rate=0.01, slow_threshold=0.5)
+       def hot_function():
+           pass
+
 Example
 =======
 
@@ -48,26 +78,232 @@ slow_function()
 """
 
 import logging
-from time import perf_counter
+import reprlib
+import sys
+import traceback
+from math import log
+from random import random
+from time import perf_counter, perf_counter_ns
 from functools import wraps
+from threading import Event, Lock, Thread
+
+from ._timing_histogram import _Histogram
 
 # Initialize logger
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
-def get_time(func: callable) -> callable:
+
+class TimingRegistry:
+    """
+    Collects the durations of `get_time(registry=...)` decorated functions in one histogram per function.
+
+    Every histogram has a fixed size, so the memory stays constant no matter how many calls are recorded.
+    Percentiles are accurate to within about 1.6%.
+    """
+    def __init__(self):
+        self._histograms = {}
+        self._lock = Lock()
+        self._dump_stop = None
+
+    def histogram(self, name: str) -> _Histogram:
+        """Return the histogram of `name`, creating it on first use."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = _Histogram()
+            return histogram
+
+    def report(self, reset: bool = False) -> dict:
+        """
+        Return the durations recorded per function.
+
+        :keyword bool reset: Forget the recorded durations once they are reported.
+        :return: {function name: {"count", "sum", "min", "max", "p50", "p90", "p99", "p999"}}, durations in seconds.
+        """
+        with self._lock:
+            histograms = list(self._histograms.items())
+
+        report = {}
+        for name, histogram in histograms:
+            report[name] = histogram.summary()
+            if reset:
+                histogram.reset()
+        return report
+
+    def reset(self):
+        """Forget every recorded duration."""
+        with self._lock:
+            for histogram in self._histograms.values():
+                histogram.reset()
+
+    def dump_every(self, interval: float, sink: callable = None, reset: bool = False):
+        """
+        Pass the report to `sink` every `interval` seconds from a daemon thread, replacing previous dumps.
+
+        :param interval: Seconds between two dumps.
+        :keyword sink: Called with the report, defaults to logging it at INFO level.
+        :keyword bool reset: Forget the recorded durations after every dump, so each report covers one interval.
+
+        :raises ValueError: If `interval` is less than or equal to 0.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be > 0")
+
+        self.stop_dumps()
+        stop = self._dump_stop = Event()
+        sink = sink or (lambda report: logger.info("Timings: %s", report))
+
+        def dump():
+            while not stop.wait(interval):
+                sink(self.report(reset=reset))
+
+        Thread(target=dump, name="power_decos-timings", daemon=True).start()
+
+    def stop_dumps(self):
+        """Stop the periodic dumps started by `dump_every`."""
+        if self._dump_stop is not None:
+            self._dump_stop.set()
+            self._dump_stop = None
+
+
+default_registry = TimingRegistry()
+
+_argument_repr = reprlib.Repr()
+_argument_repr.maxstring = 80
+_argument_repr.maxother = 80
+
+# Frames of the calling stack captured for a slow call
+_STACK_LIMIT = 5
+
+
+def _log_slow_call(call: dict):
+    logger.warning("Slow call of %s took %.3f seconds with args=%s kwargs=%s\n%s",
+                   call["function"], call["duration"], call["args"], call["kwargs"], call["stack"])
+
+
+def _skip_counter(sample_every: int | None, sample_rate: float | None) -> callable:
+    """
+    Return a function drawing the number of calls until the next timed one.
+
+    A random fraction of the calls is sampled by drawing the gaps between timed calls from a geometric
+    distribution, so the calls which are not timed only decrement a counter instead of drawing a random number.
+    """
+    if sample_every is not None:
+        return lambda: sample_every
+    if sample_rate == 1:
+        return lambda: 1
+
+    log_miss = log(1 - sample_rate)
+    return lambda: int(log(1 - random()) / log_miss) + 1
+
+
+def get_time(
+        func: callable = None,
+        *,
+        registry: TimingRegistry | bool = None,
+        sample_every: int = None,
+        sample_rate: float = None,
+        slow_threshold: float = None,
+        on_slow: callable = None
+) -> callable:
     """
     Wrapps Function and returns execution time
 
-    **Prints:**
-    - run_time (float): -> the time of the execution of a Function
+    Can be used as `@get_time` or, to pass keywords, as `@get_time(registry=...)`.
+
+    **Logs:**
+    - run_time (float): -> the time of the execution of a Function, at INFO level through the module logger
 
-    :return: Callable[..., Any]: The decorated function that prints its execution time.
+    :param func: The function to be timed.
+    :keyword registry: A `TimingRegistry` (or True for `default_registry`) recording every duration in a histogram
+                       of the function instead of logging it. Durations are measured with `perf_counter_ns`
+                       and include calls raising an exception.
+    :keyword int sample_every: Only time one call out of `sample_every`, the other calls only decrement a counter.
+    :keyword float sample_rate: Only time a random fraction (0 < rate <= 1) of the calls.
+    :keyword float slow_threshold: Seconds above which a timed call is reported, faster calls are not logged.
+                                   Slow calls are reported with a summary of their arguments and the last frames
+                                   of the calling stack.
+    :keyword on_slow: Called with {"function", "duration", "args", "kwargs", "stack"} for every slow call,
+                      defaults to logging it as a warning.
+    :return: Callable[..., Any]: The decorated function that logs its execution time.
+
+    :raises ValueError: If `sample_every` is less than 1, `sample_rate` is not in (0, 1], both of them are given
+                        or `slow_threshold` is less than or equal to 0.
 
     :note:
-        - This decorator will print the execution time regardless of whether the function
+        - This decorator will log the execution time regardless of whether the function
           raises an exception or not.
     """
+    if sample_every is not None and sample_every < 1:
+        raise ValueError("sample_every must be None or >= 1")
+    if sample_rate is not None and not 0 < sample_rate <= 1:
+        raise ValueError("sample_rate must be None or > 0 and <= 1")
+    if sample_every is not None and sample_rate is not None:
+        raise ValueError("Only one of sample_every and sample_rate can be given")
+    if slow_threshold is not None and slow_threshold <= 0:
+        raise ValueError("slow_threshold must be None or > 0")
+
+    if func is None:
+        return lambda func: get_time(func, registry=registry, sample_every=sample_every, sample_rate=sample_rate,
+                                     slow_threshold=slow_threshold, on_slow=on_slow)
+
+    sampled = sample_every is not None or sample_rate is not None
+    if registry or sampled or slow_threshold is not None:
+        name = f"{func.__module__}.{func.__qualname__}"
+        if registry is True:
+            registry = default_registry
+        histogram = registry.histogram(name) if registry else None
+        slow_ns = slow_threshold * 1e9 if slow_threshold is not None else None
+        report_slow = on_slow or _log_slow_call
+
+        def measured(duration: int, args: tuple, kwargs: dict):
+            if histogram is not None:
+                histogram.record(duration)
+            if slow_ns is None:
+                if histogram is None:
+                    logger.info("Function %s took %.3f seconds to execute", func.__name__, duration / 1e9)
+            elif duration > slow_ns:
+                # Skips this frame and the wrapper, the stack ends at the caller of the decorated function
+                stack = traceback.extract_stack(sys._getframe(2), limit=_STACK_LIMIT)
+                report_slow({
+                    "function": name,
+                    "duration": duration / 1e9,
+                    "args": _argument_repr.repr(args),
+                    "kwargs": _argument_repr.repr(kwargs),
+                    "stack": "".join(stack.format()),
+                })
+
+        if not sampled:
+            @wraps(func)
+            def measuring_wrapper(*args, **kwargs) -> any:
+                start_time = perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    measured(perf_counter_ns() - start_time, args, kwargs)
+
+            return measuring_wrapper
+
+        next_skip = _skip_counter(sample_every, sample_rate)
+        # Calls left until the next timed one, shared by every thread so sampling is only approximate under contention
+        countdown = next_skip()
+
+        @wraps(func)
+        def sampling_wrapper(*args, **kwargs) -> any:
+            nonlocal countdown
+            countdown -= 1
+            if countdown > 0:
+                return func(*args, **kwargs)
+
+            countdown = next_skip()
+            start_time = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                measured(perf_counter_ns() - start_time, args, kwargs)
+
+        return sampling_wrapper
+
     @wraps(func)
     def wrapper(*args, **kwargs) -> any:
 
@@ -75,7 +311,7 @@ def get_time(func: callable) -> callable:
         result: any = func(*args, **kwargs)
         end_time: float = perf_counter()
 
-        logger.info(f"Function {func.__name__} took {end_time - start_time:.3f} seconds to execute")
+        logger.info("Function %s took %.3f seconds to execute", func.__name__, end_time - start_time)
 
         return result
 
@@ -1,6 +1,15 @@
 from power_decos import Cache
+from power_decos._cache_snapshot import _ALIGNMENT, _BUFFER_LENGTH, _MAGIC, _RECORD_HEADER
 
+import array
+import asyncio
+import gc
+import os
+import subprocess
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 
 @pytest.fixture
@@ -93,4 +102,870 @@ def test_cache_performance(cache):
     duration_second_call = end_time - start_time
 
     # Check that the second call was faster than the first call
-    assert duration_second_call < duration_first_call, "The second call should be faster than the first call"
\ No newline at end of file
+    assert duration_second_call < duration_first_call, "The second call should be faster than the first call"
+
+def test_lru_policy_evicts_least_recently_used():
+    """Test that a bounded LRU cache evicts the entry that was not used for the longest time."""
+    cache = Cache(maxsize=2, policy="lru")
+    cache.manual_cache('test_func', 'result_1', 1)
+    cache.manual_cache('test_func', 'result_2', 2)
+
+    # Touch the first entry so the second one becomes the least recently used
+    assert cache.get_cached_value('test_func', 1) == 'result_1'
+    cache.manual_cache('test_func', 'result_3', 3)
+
+    assert len(cache.cache) == 2, "Cache should never grow past maxsize"
+    assert cache.get_cached_value('test_func', 2) is None, "Least recently used entry should be evicted"
+    assert cache.get_cached_value('test_func', 1) == 'result_1'
+
+
+def test_lfu_policy_evicts_least_frequently_used():
+    """Test that a bounded LFU cache evicts the entry with the fewest hits."""
+    cache = Cache(maxsize=2, policy="lfu")
+    cache.manual_cache('test_func', 'result_1', 1)
+    cache.manual_cache('test_func', 'result_2', 2)
+
+    for _ in range(3):
+        cache.get_cached_value('test_func', 1)
+    cache.get_cached_value('test_func', 2)
+    cache.manual_cache('test_func', 'result_3', 3)
+
+    assert cache.get_cached_value('test_func', 2) is None, "Least frequently used entry should be evicted"
+    assert cache.get_cached_value('test_func', 1) == 'result_1'
+    assert cache.get_cached_value('test_func', 3) == 'result_3'
+
+
+def test_fifo_policy_ignores_hits():
+    """Test that a bounded FIFO cache evicts the oldest entry even if it was just used."""
+    cache = Cache(maxsize=2, policy="fifo")
+    cache.manual_cache('test_func', 'result_1', 1)
+    cache.manual_cache('test_func', 'result_2', 2)
+
+    cache.get_cached_value('test_func', 1)
+    cache.manual_cache('test_func', 'result_3', 3)
+
+    assert cache.get_cached_value('test_func', 1) is None, "Oldest entry should be evicted"
+    assert cache.get_cached_value('test_func', 2) == 'result_2'
+
+
+def test_ttl_expires_entries():
+    """Test that entries are dropped once their ttl has passed."""
+    cache = Cache(ttl=0.05)
+    calls = 0
+
+    @cache.cache_func
+    def count_calls(x):
+        nonlocal calls
+        calls += 1
+        return x
+
+    count_calls(1)
+    count_calls(1)
+    assert calls == 1, "Second call should be a cache hit"
+
+    time.sleep(0.1)
+    count_calls(1)
+    assert calls == 2, "Expired entry should be recomputed"
+    assert len(cache.cache) == 1, "Expired entry should have been replaced, not duplicated"
+
+
+def test_cache_func_respects_maxsize():
+    """Test that the decorator never lets the cache grow past maxsize."""
+    cache = Cache(maxsize=10)
+
+    @cache.cache_func
+    def square(x):
+        return x * x
+
+    for i in range(100):
+        assert square(i) == i * i
+
+    assert len(cache.cache) == 10, "Cache should never grow past maxsize"
+
+
+def test_invalid_cache_arguments():
+    """Test that invalid constructor arguments raise a ValueError."""
+    with pytest.raises(ValueError):
+        Cache(maxsize=0)
+    with pytest.raises(ValueError):
+        Cache(ttl=0)
+    with pytest.raises(ValueError):
+        Cache(policy="random")
+
+
+def test_get_cached_value_partial_match_function_only(cache):
+    """Test that a partial lookup without args and kwargs returns every entry of that function only."""
+    cache.manual_cache('test_func', 'result_1', 1, key='value')
+    cache.manual_cache('test_func', 'result_2', 2)
+    cache.manual_cache('other_func', 'result_3', 1, key='value')
+
+    results = cache.get_cached_value('test_func', compare_all=False)
+
+    assert results == ['result_1', 'result_2'], "Expected every entry of test_func in insertion order"
+
+
+def test_get_cached_value_partial_match_normalized(cache):
+    """Test that partial lookups through a function match arguments by parameter, however they were passed."""
+    @cache.cache_func
+    def fetch(item, key=None, *, limit=10):
+        return item
+
+    fetch(1, key='value'), fetch(2), fetch(3, 'value', limit=5), fetch([4], key='value')
+
+    assert cache.get_cached_value(fetch, compare_all=False, key='value') == [1, 3, [4]]
+    assert cache.get_cached_value(fetch, 2, compare_all=False) == [2]
+    assert cache.get_cached_value(fetch, item=2, compare_all=False) == [2]
+    assert cache.get_cached_value(fetch, [4], compare_all=False) == [[4]]
+    assert cache.get_cached_value(fetch, compare_all=False, limit=5) == [3]
+    assert cache.get_cached_value(fetch, 1, key='other', compare_all=False) == []
+
+
+def test_partial_lookup_index_follows_eviction():
+    """Test that evicted entries are no longer returned by partial lookups."""
+    cache = Cache(maxsize=1)
+    cache.manual_cache('test_func', 'result_1', 1, key='value')
+    cache.manual_cache('test_func', 'result_2', 2, key='value')
+
+    assert cache.get_cached_value('test_func', compare_all=False, key='value') == ['result_2']
+    assert cache.get_cached_value('test_func', 1, compare_all=False) == []
+
+
+def test_partial_lookup_by_function_follows_invalidation(cache):
+    """Test that partial lookups through a function only see the entries still cached."""
+    @cache.cache_func
+    def fetch(item, key=None):
+        return item
+
+    fetch(1, 'a'), fetch(2, 'a'), fetch(1, 'b')
+    cache.invalidate(fetch, 1, 'a')
+
+    assert cache.get_cached_value(fetch, 1, compare_all=False) == [1]
+    assert cache.get_cached_value(fetch, key='a', compare_all=False) == [2]
+    assert cache.get_cached_value(fetch, 1, key='a', compare_all=False) == []
+
+    cache.invalidate_function(fetch)
+    assert cache.get_cached_value(fetch, compare_all=False) == []
+    assert not cache._argument_index
+
+
+def test_thread_safe_single_flight():
+    """Test that concurrent misses on the same key only run the function once and share the result."""
+    cache = Cache(thread_safe=True)
+    calls = 0
+
+    @cache.cache_func
+    def slow_function(x):
+        nonlocal calls
+        calls += 1
+        time.sleep(0.2)
+        return x * x
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(slow_function, [5] * 8))
+
+    assert results == [25] * 8
+    assert calls == 1, "Concurrent misses on the same key should share a single computation"
+
+
+def test_thread_safe_single_flight_shares_exception():
+    """Test that waiting threads receive the exception raised by the shared computation and nothing is cached."""
+    cache = Cache(thread_safe=True)
+    calls = 0
+
+    @cache.cache_func
+    def failing_function(x):
+        nonlocal calls
+        calls += 1
+        time.sleep(0.2)
+        raise ValueError("failed")
+
+    def call(x):
+        with pytest.raises(ValueError, match="failed"):
+            failing_function(x)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(call, [1] * 4))
+
+    assert calls == 1
+    assert len(cache.cache) == 0, "Failed computations should not be cached"
+
+
+def test_cache_coroutine_function():
+    """Test that coroutine functions cache their awaited result and can be awaited more than once."""
+    cache = Cache()
+    calls = 0
+
+    @cache.cache_func
+    async def async_square(x):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        return x * x
+
+    async def main():
+        return [await async_square(3), await async_square(3)]
+
+    assert asyncio.run(main()) == [9, 9]
+    assert calls == 1, "Second await should be a cache hit"
+    assert cache.get_cached_value(async_square, 3) == 9, "The awaited result should be cached, not the coroutine"
+
+
+def test_cache_coroutine_single_flight():
+    """Test that concurrent awaiters of the same key share one task."""
+    cache = Cache()
+    calls = 0
+
+    @cache.cache_func
+    async def slow_square(x):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return x * x
+
+    async def main():
+        return await asyncio.gather(*(slow_square(4) for _ in range(5)))
+
+    assert asyncio.run(main()) == [16] * 5
+    assert calls == 1, "Concurrent awaiters should share one computation"
+
+
+def test_cache_coroutine_cancellation():
+    """Test that cancelling one awaiter keeps the shared task alive while cancelling the last one stops it."""
+    cache = Cache()
+
+    @cache.cache_func
+    async def slow_square(x):
+        await asyncio.sleep(0.05)
+        return x * x
+
+    async def main():
+        first = asyncio.ensure_future(slow_square(2))
+        second = asyncio.ensure_future(slow_square(2))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == 4, "Remaining awaiter should still get the result"
+
+        lonely = asyncio.ensure_future(slow_square(3))
+        await asyncio.sleep(0)
+        lonely.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await lonely
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert cache.get_cached_value(slow_square, 2) == 4
+    assert cache.get_cached_value(slow_square, 3) is None, "Cancelled computation should not be cached"
+
+
+def test_disk_tier_io_off_the_event_loop(tmp_path):
+    """Test that coroutine functions read and write the disk tier outside of the event loop thread."""
+    cache = Cache(maxsize=1, disk_path=str(tmp_path / "cache.sqlite3"), disk_batch_size=1)
+    disk_tier, = cache._tiers
+    tier_threads = []
+    for name in ('get', 'put'):
+        def record(*args, method=getattr(disk_tier, name)):
+            tier_threads.append(threading.get_ident())
+            return method(*args)
+        setattr(disk_tier, name, record)
+
+    @cache.cache_func
+    async def square(x):
+        return x * x
+
+    @cache.cache_batch
+    async def cubes(items):
+        return [x ** 3 for x in items]
+
+    async def main():
+        assert [await square(2), await square(3), await square(2)] == [4, 9, 4]
+        assert await cubes([2, 3]) == [8, 27]
+        assert await cubes([2]) == [8]
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+    assert tier_threads and loop_thread not in tier_threads
+    assert cache.stats()['hits'] == 2
+
+
+def test_disk_tier_warm_start(tmp_path):
+    """Test that a new Cache using the same disk file starts with the entries of the previous one."""
+    disk_path = str(tmp_path / "cache.sqlite3")
+    cache = Cache(disk_path=disk_path)
+    cache.manual_cache('test_func', 'result_1', 1, key='value')
+    cache.flush()
+
+    warm_cache = Cache(disk_path=disk_path)
+    assert len(warm_cache.cache) == 1, "Disk entries should be loaded into memory on creation"
+    assert warm_cache.get_cached_value('test_func', 1, key='value') == 'result_1'
+
+
+def test_disk_tier_fall_through_and_promotion(tmp_path):
+    """Test that misses in memory fall through to the disk and are promoted back into memory."""
+    disk_path = str(tmp_path / "cache.sqlite3")
+    cache = Cache(maxsize=1, disk_path=disk_path, disk_batch_size=1)
+    calls = 0
+
+    @cache.cache_func
+    def square(x):
+        nonlocal calls
+        calls += 1
+        return x * x
+
+    square(2)
+    square(3)  # evicts 2 from memory, it stays on disk
+    assert square(2) == 4
+    assert calls == 2, "Evicted entry should be served by the disk tier"
+    assert list(cache.cache.values()) == [4], "Disk hit should be promoted to memory"
+
+    cold_cache = Cache(disk_path=disk_path, warm_start=False)
+    assert len(cold_cache.cache) == 0
+    assert cold_cache.get_cached_value(square, 3) == 9
+
+
+def test_disk_tier_clear_cache(tmp_path):
+    """Test that clear_cache also empties the disk tier."""
+    disk_path = str(tmp_path / "cache.sqlite3")
+    cache = Cache(disk_path=disk_path)
+    cache.manual_cache('test_func', 'result_1', 1)
+    cache.clear_cache()
+
+    assert Cache(disk_path=disk_path).get_cached_value('test_func', 1) is None
+
+
+def test_disk_tier_keys_independent_of_hash_seed(tmp_path):
+    """Test that processes with different hash seeds share the entries of dict, set and frozenset arguments."""
+    script = (
+        "from power_decos import Cache\n"
+        f"cache = Cache(disk_path={str(tmp_path / 'cache.sqlite3')!r}, warm_start=False)\n"
+        "@cache.cache_func\n"
+        "def handle(request, flags, *, options):\n"
+        "    print('computed')\n"
+        "handle({'alpha': 1, 'beta': [1, 2], 'gamma': {'x', 'y', 'z'}}, frozenset({'a', 'b', 'c'}),"
+        " options={'retry', 'cache', 'log'})\n"
+    )
+    outputs = [
+        subprocess.run(
+            [sys.executable, "-c", script], check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(__file__)), env={**os.environ, "PYTHONHASHSEED": seed}
+        ).stdout
+        for seed in ("1", "2", "3")
+    ]
+    assert outputs == ["computed\n", "", ""], "Only the first process should compute the entry"
+
+
+def test_cache_func_normalizes_arguments(cache):
+    """Test that passing arguments by position, by keyword or through defaults results in a single entry."""
+    calls = 0
+
+    @cache.cache_func
+    def add(a, b=2, *, c=0):
+        nonlocal calls
+        calls += 1
+        return a + b + c
+
+    assert add(1, 2) == add(1, b=2) == add(a=1, b=2) == add(1) == add(1, 2, c=0) == 3
+    assert calls == 1, "Every call should share the same normalized key"
+    assert cache.get_cached_value(add, a=1) == 3, "Lookups through the function should be normalized as well"
+
+
+def test_cache_func_same_name_does_not_collide(cache):
+    """Test that functions sharing a __name__ but living in different classes get separate entries."""
+    class First:
+        @staticmethod
+        @cache.cache_func
+        def value():
+            return 1
+
+    class Second:
+        @staticmethod
+        @cache.cache_func
+        def value():
+            return 2
+
+    assert First.value() == 1
+    assert Second.value() == 2, "Functions with the same __name__ should not share entries"
+
+
+def test_cache_func_fingerprints_unhashable_arguments(cache):
+    """Test that lists, dicts and buffers can be passed to a cached function."""
+    calls = 0
+
+    @cache.cache_func
+    def total(values, options=None):
+        nonlocal calls
+        calls += 1
+        return sum(values) + len(options or {})
+
+    assert total([1, 2, 3], options={'a': [1]}) == 7
+    assert total([1, 2, 3], {'a': [1]}) == 7
+    assert calls == 1, "Equal unhashable arguments should share an entry"
+
+    assert total(bytearray(b'\x01\x02'), options={'a': [1]}) == 4
+    assert total(bytearray(b'\x01\x02'), options={'a': [1]}) == 4
+    assert total(array.array('b', [1, 2])) == 3
+    assert calls == 3, "Buffers should be fingerprinted by content and type"
+    assert cache.get_cached_value(total, [1, 2, 3], {'a': [1]}) == 7
+
+
+def test_cache_func_identity_fingerprint():
+    """Test that fingerprint='identity' keys unhashable arguments by the object itself."""
+    cache = Cache(fingerprint="identity")
+    calls = 0
+
+    @cache.cache_func
+    def length(values):
+        nonlocal calls
+        calls += 1
+        return len(values)
+
+    payload = [1, 2, 3]
+    length(payload)
+    length(payload)
+    length([1, 2, 3])
+    assert calls == 2, "Only the very same object should hit the cache"
+
+
+def test_cache_func_unsupported_unhashable_argument(cache):
+    """Test that unhashable objects which can't be fingerprinted raise a TypeError."""
+    class Unhashable:
+        __hash__ = None
+
+    @cache.cache_func
+    def identity(value):
+        return value
+
+    with pytest.raises(TypeError, match="can't be fingerprinted"):
+        identity(Unhashable())
+
+
+def test_stats_counters():
+    """Test that stats() reports hits, misses, inserts, evictions and the time saved per function."""
+    cache = Cache(maxsize=2)
+
+    @cache.cache_func
+    def slow_square(x):
+        time.sleep(0.01)
+        return x * x
+
+    slow_square(1)
+    slow_square(1)
+    slow_square(2)
+    slow_square(3)
+
+    stats = cache.stats()
+    function_stats = stats["functions"][slow_square._cache_key_builder.name]
+    assert (stats["hits"], stats["misses"], stats["inserts"], stats["evictions"]) == (1, 3, 3, 1)
+    assert function_stats["entries"] == stats["entries"] == 2
+    assert function_stats["bytes"] > 0
+    assert function_stats["time_saved"] >= 0.01, "A hit should save the time the original call took"
+
+    cache.reset_stats()
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["time_saved"]) == (0, 0, 0)
+    assert stats["entries"] == 2, "reset_stats should keep describing the current entries"
+
+
+def test_max_bytes_evicts_by_size():
+    """Test that a memory budgeted cache evicts entries to stay under max_bytes."""
+    cache = Cache(max_bytes=3000, sizeof=len)
+    cache.manual_cache('test_func', b'a' * 1000, 1)
+    cache.manual_cache('test_func', b'b' * 1000, 2)
+    cache.manual_cache('test_func', b'c' * 1500, 3)
+
+    assert cache.get_cached_value('test_func', 1) is None, "Oldest entry should be evicted to fit the new one"
+    assert cache.stats()["bytes"] == 2500
+
+    cache.manual_cache('test_func', b'd' * 5000, 4)
+    assert cache.get_cached_value('test_func', 4) is None, "Values larger than the budget should not be cached"
+    assert len(cache.cache) == 2
+
+    cache = Cache(max_bytes=1000, sizeof=len, policy="lfu")
+    cache.manual_cache('test_func', b'a' * 600, 1)
+    cache.get_cached_value('test_func', 1)
+    cache.manual_cache('test_func', b'b' * 600, 2)
+    assert cache.stats()["bytes"] == 600, "A new LFU key should evict the other entries, not stay over budget"
+    assert cache.get_cached_value('test_func', 2) is not None
+
+    cache = Cache(max_bytes=1000, sizeof=len, policy="fifo")
+    cache.manual_cache('test_func', b'a' * 300, 1)
+    cache.manual_cache('test_func', b'b' * 300, 2)
+    cache.manual_cache('test_func', b'c' * 300, 3)
+    cache.manual_cache('test_func', b'a' * 700, 1)
+    assert cache.stats()["bytes"] == 1000, "Overwriting the oldest FIFO key should evict the next oldest ones"
+    assert cache.get_cached_value('test_func', 2) is None
+
+
+def test_max_bytes_default_deep_sizeof():
+    """Test that the default size estimate accounts for the contents of containers."""
+    cache = Cache(max_bytes=10_000)
+    cache.manual_cache('test_func', [b'x' * 4000, b'y' * 4000], 1)
+    cache.manual_cache('test_func', [b'z' * 4000], 2)
+
+    assert cache.get_cached_value('test_func', 1) is None, "Nested bytes should count towards the budget"
+    assert cache.get_cached_value('test_func', 2) is not None
+
+
+def test_weak_values_are_reclaimed():
+    """Test that weakly held values disappear once nobody else references them."""
+    class Result:
+        pass
+
+    cache = Cache(weak_values=True)
+    result = Result()
+    cache.manual_cache('test_func', result, 1)
+    cache.manual_cache('test_func', 42, 2)
+
+    assert cache.get_cached_value('test_func', 1) is result
+    del result
+    gc.collect()
+
+    assert cache.get_cached_value('test_func', 1) is None, "Collected value should be treated as a miss"
+    assert cache.get_cached_value('test_func', 2) == 42, "Values without weak reference support are kept strongly"
+
+
+def test_shared_tier_between_caches(tmp_path):
+    """Test that two caches mapping the same shared file see each other's entries."""
+    shared_path = str(tmp_path / "shared.cache")
+    writer = Cache(shared_path=shared_path, shared_slots=64, shared_slot_size=512)
+    reader = Cache(shared_path=shared_path)
+
+    writer.manual_cache('test_func', {'answer': 42}, 1)
+    assert reader.get_cached_value('test_func', 1) == {'answer': 42}
+
+    writer.manual_cache('test_func', b'x' * 1024, 2)
+    assert reader.get_cached_value('test_func', 2) is None, "Entries larger than a slot should not be shared"
+
+    reader.clear_cache()
+    assert Cache(shared_path=shared_path).get_cached_value('test_func', 1) is None
+
+
+def test_shared_tier_between_processes(tmp_path):
+    """Test that an entry computed in another process is a hit in this one."""
+    shared_path = str(tmp_path / "shared.cache")
+    script = (
+        "from power_decos import Cache\n"
+        f"cache = Cache(shared_path={shared_path!r})\n"
+        "cache.manual_cache('test_func', 'from_child', 1)\n"
+    )
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+
+    assert Cache(shared_path=shared_path).get_cached_value('test_func', 1) == 'from_child'
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_tiers_after_fork(tmp_path):
+    """Test that a process forked after the cache is built locks the shared file and writes the disk on its own."""
+    cache = Cache(shared_path=str(tmp_path / "shared.cache"), disk_path=str(tmp_path / "cache.sqlite3"))
+    shared_tier, disk_tier = cache._tiers
+    cache.manual_cache('test_func', 'from_parent', 1)
+    read_fd, write_fd = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read_fd)
+            with shared_tier._locked(exclusive=True):
+                os.write(write_fd, b"locked")
+                time.sleep(0.5)
+            disk_tier.put(('test_func', (2,), frozenset()), 'from_child')
+            disk_tier.flush()
+            status = 0
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    assert os.read(read_fd, 6) == b"locked"
+    os.close(read_fd)
+    start = time.monotonic()
+    with shared_tier._locked(exclusive=True):
+        waited = time.monotonic() - start
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert waited > 0.3, "The parent should wait for the lock held by the child"
+    assert disk_tier.get(('test_func', (2,), frozenset())) == 'from_child'
+    assert cache.get_cached_value('test_func', 1) == 'from_parent'
+
+
+def test_soft_ttl_serves_stale_and_refreshes_in_background(cache):
+    """Test that a stale entry is returned immediately while a single background refresh updates it."""
+    calls = 0
+
+    @cache.cache_func(soft_ttl=0.05, hard_ttl=10)
+    def counter():
+        nonlocal calls
+        calls += 1
+        time.sleep(0.05)
+        return calls
+
+    assert counter() == 1
+    time.sleep(0.06)
+
+    start_time = time.perf_counter()
+    assert [counter() for _ in range(5)] == [1] * 5, "Stale value should be served while refreshing"
+    assert time.perf_counter() - start_time < 0.05, "Stale hits should not wait for the refresh"
+
+    time.sleep(0.1)
+    assert counter() == 2, "Refreshed value should replace the stale one"
+    assert calls == 2, "Concurrent stale hits should only trigger one refresh"
+
+
+def test_hard_ttl_expires_entries(cache):
+    """Test that entries past their hard_ttl are recomputed synchronously."""
+    calls = 0
+
+    @cache.cache_func(soft_ttl=0.01, hard_ttl=0.05)
+    def counter():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    counter()
+    time.sleep(0.06)
+    assert counter() == 2, "Expired entry should be recomputed by the caller"
+
+
+def test_soft_ttl_refreshes_on_unlocked_cache():
+    """Test that background refreshes don't corrupt a cache created without thread_safe."""
+    cache = Cache(maxsize=50, ttl=0.05)
+
+    @cache.cache_func(soft_ttl=0.001)
+    def double(x):
+        return x * 2
+
+    end_time = time.monotonic() + 0.5
+    while time.monotonic() < end_time:
+        for x in range(100):
+            assert double(x) == x * 2
+
+    time.sleep(0.1)
+    assert len(cache._policy._order) == len(cache.cache), "Policy should track every entry exactly once"
+
+
+def test_soft_ttl_validation(cache):
+    """Test that a soft_ttl which is not below the hard_ttl is rejected."""
+    with pytest.raises(ValueError, match="soft_ttl must be smaller than hard_ttl"):
+        cache.cache_func(soft_ttl=5, hard_ttl=1)
+
+
+def test_cache_batch_only_computes_missing_items(cache):
+    """Test that a batch function is only called with the items missing from the cache."""
+    requested = []
+
+    @cache.cache_batch
+    def squares(ids, offset=0):
+        requested.append(list(ids))
+        return [i * i + offset for i in ids]
+
+    assert squares([1, 2, 3]) == [1, 4, 9]
+    assert squares([3, 4, 2, 4]) == [9, 16, 4, 16]
+    assert requested == [[1, 2, 3], [4]], "Only the missing (deduplicated) items should be computed"
+
+    assert squares([1, 2], offset=1) == [2, 5], "Other arguments should be part of the per item key"
+    assert cache.get_cached_value(squares, 4) == 16, "Items should be cached as single item calls"
+
+
+def test_cache_batch_mapping_result(cache):
+    """Test that batch functions may return a dict mapping each item to its result."""
+    @cache.cache_batch
+    def lookup(names):
+        return {name: name.upper() for name in reversed(names)}
+
+    assert lookup(['a', 'b']) == ['A', 'B']
+    assert lookup(['b', 'c']) == ['B', 'C']
+
+
+def test_cache_batch_wrong_result_length(cache):
+    """Test that a batch function returning the wrong number of results raises a ValueError."""
+    @cache.cache_batch
+    def broken(ids):
+        return []
+
+    with pytest.raises(ValueError, match="returned 0 results for 2 items"):
+        broken([1, 2])
+
+
+def test_invalidate_single_call_and_function(cache):
+    """Test that invalidate removes one call and invalidate_function every call of a function."""
+    @cache.cache_func
+    def add(a, b=0):
+        return a + b
+
+    @cache.cache_func
+    def sub(a, b=0):
+        return a - b
+
+    add(1, 2), add(2), sub(1, 2)
+    assert cache.invalidate(add, 1, b=2) == 1, "Keys should be normalized like the calls themselves"
+    assert cache.get_cached_value(add, 1, 2) is None
+    assert cache.get_cached_value(add, 2) == 2
+
+    assert cache.invalidate_function(add) == 1
+    assert cache.get_cached_value(add) is None
+    assert cache.get_cached_value(sub, 1, 2) == -1, "Other functions should be left untouched"
+
+
+def test_invalidate_where_and_tags(tmp_path):
+    """Test predicate and tag based invalidation, including entries only held by the disk tier."""
+    cache = Cache(disk_path=str(tmp_path / "cache.db"))
+
+    @cache.cache_func(tags=lambda user_id, field: f"user:{user_id}")
+    def profile(user_id, field):
+        return f"{user_id}.{field}"
+
+    @cache.cache_func(tags="config")
+    def setting(name):
+        return name.upper()
+
+    profile(1, "name"), profile(1, "mail"), profile(2, "name"), setting("a")
+
+    assert cache.invalidate_where(lambda key, value: value.endswith("mail"), profile) == 1
+    assert cache.get_cached_value(profile, 1, "mail") is None
+
+    assert cache.invalidate_tags("user:1") == 1
+    assert cache.get_cached_value(profile, 1, "name") is None
+    assert cache.get_cached_value(profile, 2, "name") == "2.name"
+
+    cache.flush()
+    fresh = Cache(disk_path=str(tmp_path / "cache.db"), warm_start=False)
+    fresh.cache_func(tags="config")(setting.__wrapped__)
+    fresh.invalidate_tags("config")
+    assert fresh.get_cached_value(setting, "a") is None, "Tagged entries should be removed from the disk tier"
+
+
+def test_tags_of_unhashable_arguments(tmp_path):
+    """Test that tag callables receive the actual arguments of calls whose keys are fingerprinted."""
+    cache = Cache(disk_path=str(tmp_path / "cache.db"))
+
+    @cache.cache_func(tags=lambda request: f"user:{request['id']}")
+    def handle(request):
+        return request["id"] * 10
+
+    assert handle({"id": 1}) == 10
+    assert handle({"id": 2}) == 20
+    assert handle({"id": 1}) == 10
+
+    assert cache.invalidate_tags("user:1") == 1
+    assert cache.get_cached_value(handle, {"id": 1}) is None, "Entry should be removed from memory and disk"
+    assert cache.get_cached_value(handle, {"id": 2}) == 20
+
+    cache.flush()
+    fresh = Cache(disk_path=str(tmp_path / "cache.db"), warm_start=False)
+    fresh_handle = fresh.cache_func(tags=lambda request: f"user:{request['id']}")(handle.__wrapped__)
+    assert fresh_handle({"id": 2}) == 20, "Promoted entries should be tagged from the actual arguments"
+    assert fresh.invalidate_tags("user:2") == 1
+
+
+def test_dump_and_load_snapshot(cache, tmp_path):
+    """Test that a snapshot restores every entry, writing large buffers out-of-band."""
+    @cache.cache_func
+    def payload(size):
+        return bytearray(range(256)) * size
+
+    @cache.cache_func
+    def square(x):
+        return x * x
+
+    payload(1), payload(1024), square(3)
+    cache.manual_cache('raw', b'x' * 2 ** 20, 'bytes')
+    cache.manual_cache('raw', array.array('d', range(2 ** 14)), 'array')
+    path = str(tmp_path / "cache.snapshot")
+    assert cache.dump(path) == 5
+
+    data = open(path, 'rb').read()
+    position = len(_MAGIC)
+    records = []
+    while True:
+        pickle_length, buffer_count = _RECORD_HEADER.unpack_from(data, position)
+        position += _RECORD_HEADER.size
+        if not pickle_length:
+            break
+        lengths = [_BUFFER_LENGTH.unpack_from(data, position + index * _BUFFER_LENGTH.size)[0]
+                   for index in range(buffer_count)]
+        position += buffer_count * _BUFFER_LENGTH.size + pickle_length
+        for length in lengths:
+            position += -position % _ALIGNMENT + length
+        records.append((pickle_length, buffer_count))
+    assert sorted(count for _, count in records) == [0, 0, 1, 1, 1], "Large buffers should be written out-of-band"
+    assert all(pickle_length < 1024 for pickle_length, _ in records), "Large buffers should not be in the pickles"
+
+    fresh = Cache()
+    assert fresh.load(path) == 5
+    assert fresh.get_cached_value(payload, 1024) == bytearray(range(256)) * 1024
+    assert fresh.get_cached_value(payload, 1) == bytearray(range(256))
+    assert fresh.get_cached_value(square, 3) == 9
+    assert fresh.get_cached_value('raw', 'bytes') == b'x' * 2 ** 20
+    assert fresh.get_cached_value('raw', 'array') == array.array('d', range(2 ** 14))
+
+
+def test_load_skips_expired_entries(tmp_path):
+    """Test that entries which expired since the snapshot was taken are not loaded."""
+    cache = Cache(ttl=0.05)
+    cache.manual_cache('f', 1, 1)
+    path = str(tmp_path / "cache.snapshot")
+    cache.dump(path)
+
+    time.sleep(0.06)
+    assert Cache().load(path) == 0
+
+    with pytest.raises(ValueError, match="is not a cache snapshot"):
+        (tmp_path / "other").write_bytes(b"not a snapshot")
+        Cache().load(str(tmp_path / "other"))
+
+
+def test_cache_func_replays_generators(cache):
+    """Test that generator results are buffered lazily and replayed to every caller."""
+    pulled = []
+
+    @cache.cache_func
+    def numbers(n):
+        for i in range(n):
+            pulled.append(i)
+            yield i
+
+    first = numbers(5)
+    assert [next(first), next(first)] == [0, 1]
+    assert pulled == [0, 1], "Items should only be pulled when a consumer asks for them"
+
+    second = numbers(5)
+    assert list(second) == [0, 1, 2, 3, 4], "Later callers should replay and continue pulling"
+    assert list(first) == [2, 3, 4]
+    assert list(numbers(5)) == [0, 1, 2, 3, 4]
+    assert pulled == [0, 1, 2, 3, 4], "Every item should be pulled from the generator once"
+
+
+def test_cache_func_generator_concurrent_consumers():
+    """Test that threads consuming the same cached generator all see every item."""
+    cache = Cache(thread_safe=True)
+    pulled = []
+
+    @cache.cache_func
+    def numbers():
+        for i in range(200):
+            pulled.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: list(numbers()), range(8)))
+
+    assert all(result == list(range(200)) for result in results)
+    assert pulled == list(range(200))
+
+
+def test_cache_func_failing_generator_is_dropped(cache):
+    """Test that a generator raising an exception is not kept in the cache."""
+    calls = 0
+
+    @cache.cache_func
+    def flaky():
+        nonlocal calls
+        calls += 1
+        yield 1
+        if calls == 1:
+            raise RuntimeError("source failed")
+        yield 2
+
+    with pytest.raises(RuntimeError, match="source failed"):
+        list(flaky())
+    assert list(flaky()) == [1, 2], "The failed entry should be recomputed"
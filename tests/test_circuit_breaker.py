@@ -0,0 +1,112 @@
+from power_decos import CircuitBreaker, CircuitOpenError, retry
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
+import warnings
+import pytest
+
+
+def test_breaker_opens_at_failure_rate():
+    """Test that the breaker opens once the failure rate of the window reaches the threshold."""
+    breaker = CircuitBreaker(failure_threshold=0.5, window=4, min_calls=4)
+
+    for outcome in (breaker.record_success, breaker.record_failure, breaker.record_success):
+        assert breaker.allow()
+        outcome()
+    assert breaker.state == "closed", "The breaker should wait for min_calls"
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_probes():
+    """Test that an open breaker lets a limited number of probes through and closes once they succeed."""
+    breaker = CircuitBreaker(window=1, min_calls=1, reset_timeout=0.05, half_open_probes=2)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow(), "Only half_open_probes calls should be let through"
+
+    breaker.record_success()
+    assert breaker.state == "half_open"
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open", "A failed probe should open the breaker again"
+
+
+def test_retry_fails_fast_while_open():
+    """Test that retry stops invoking the function once its breaker is open."""
+    calls = 0
+
+    @retry(retries=3, delay=0.01, raise_exception=True,
+           circuit_breaker=CircuitBreaker(window=2, min_calls=2, reset_timeout=60))
+    def always_fail():
+        nonlocal calls
+        calls += 1
+        raise Exception("downstream is down")
+
+    with pytest.raises(CircuitOpenError, match="is open"):
+        always_fail()
+    assert calls == 2, "The third attempt should be rejected by the open breaker"
+
+    with pytest.raises(CircuitOpenError):
+        always_fail()
+    assert calls == 2
+    assert always_fail.circuit_breaker.state == "open"
+
+
+def test_retry_named_breaker_and_fallback():
+    """Test that functions using the same breaker name share it and rejected calls return the fallback."""
+    @retry(retries=1, delay=0.01, circuit_breaker="test-shared", fallback=lambda user_id: f"cached {user_id}")
+    def first(user_id):
+        raise Exception("downstream is down")
+
+    @retry(retries=1, delay=0.01, circuit_breaker="test-shared", fallback=lambda user_id: f"cached {user_id}")
+    def second(user_id):
+        return f"fresh {user_id}"
+
+    assert first.circuit_breaker is second.circuit_breaker is CircuitBreaker.named("test-shared")
+    for _ in range(5):
+        first(1)
+    assert second(2) == "cached 2"
+
+
+def test_retry_async_fallback_is_awaited():
+    """Test that a coroutine function rejected by its breaker returns the awaited result of an async fallback."""
+    async def fallback(user_id):
+        return f"cached {user_id}"
+
+    @retry(retries=1, delay=0.01, circuit_breaker=CircuitBreaker(window=2, min_calls=2), fallback=fallback)
+    async def fetch(user_id):
+        raise Exception("downstream is down")
+
+    async def main():
+        return [await fetch(index) for index in range(3)]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert asyncio.run(main()) == [None, None, "cached 2"]
+
+
+def test_breaker_thread_safety():
+    """Test that concurrent outcomes keep the window consistent."""
+    breaker = CircuitBreaker(failure_threshold=1, window=100, min_calls=100)
+
+    def record(index):
+        breaker.allow()
+        breaker.record_failure() if index % 2 else breaker.record_success()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(record, range(1000)))
+
+    assert breaker.state == "closed"
+    assert breaker._failures == sum(breaker._outcomes)
@@ -0,0 +1,54 @@
+from power_decos import RetryBudget, retry
+import pytest
+
+
+def test_budget_refills_from_successes():
+    """Test that retries take tokens and successful calls refill a fraction of one."""
+    budget = RetryBudget(ratio=0.5, max_tokens=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw(), "An empty budget should refuse retries"
+
+    budget.record_success()
+    assert not budget.withdraw()
+    budget.record_success()
+    assert budget.withdraw()
+
+    for _ in range(10):
+        budget.record_success()
+    assert budget.tokens == 2, "The budget should never exceed max_tokens"
+
+
+def test_retry_skips_retries_once_budget_is_exhausted():
+    """Test that functions sharing a named budget stop retrying once it is exhausted."""
+    RetryBudget.named("test-storm", ratio=0, max_tokens=3)
+    tries = 0
+
+    @retry(retries=3, delay=0.01, budget="test-storm")
+    def first():
+        nonlocal tries
+        tries += 1
+        raise Exception("This is a test for the @retry decorator")
+
+    @retry(retries=3, delay=0.01, raise_exception=True, budget="test-storm")
+    def second():
+        nonlocal tries
+        tries += 1
+        raise Exception("This is a test for the @retry decorator")
+
+    first()
+    assert tries == 3
+    with pytest.raises(Exception, match="This is a test"):
+        second()
+    assert tries == 5, "Only the one token left should be spent on a retry"
+
+    with pytest.raises(Exception, match="This is a test"):
+        second()
+    assert tries == 6, "The failure should be surfaced at once"
+
+
+def test_budget_validation():
+    """Test that invalid budget arguments are rejected."""
+    with pytest.raises(ValueError, match="ratio must be >= 0"):
+        RetryBudget(ratio=-1)
+    with pytest.raises(ValueError, match="max_tokens must be >= 1"):
+        RetryBudget(max_tokens=0)
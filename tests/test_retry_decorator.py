@@ -2,8 +2,13 @@
 test_retry_raise_exception_assertion not working
 """
 
-from power_decos import retry
+from power_decos import retry, retry_batch
+from power_decos._retry_hedging import _Hedger
+import asyncio
+import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 
 
@@ -65,3 +70,413 @@ def test_retry_type_error():
         retry(retries=3, delay=1, raise_exception=True, exception_types=123)  # Invalid type
     with pytest.raises(TypeError, match="Exception\(s\) passed is not a type or a tuple of types."):
         retry(retries=3, delay=1, raise_exception=True, exception_types=[Exception])  # Invalid type, should be a type or tuple
+
+
+def test_retry_exponential_backoff_with_max_delay(monkeypatch):
+    """Test that exponential backoff doubles the delay up to max_delay."""
+    sleeps = []
+    monkeypatch.setattr("power_decos.retry_decorator.sleep", sleeps.append)
+
+    @retry(retries=6, delay=0.1, backoff="exponential", max_delay=1)
+    def always_fail():
+        raise Exception("This is a test for the @retry decorator")
+
+    always_fail()
+    assert sleeps == pytest.approx([0.1, 0.2, 0.4, 0.8, 1])
+
+
+def test_retry_jittered_and_custom_backoff(monkeypatch):
+    """Test that jittered delays stay within their bounds and custom strategies are used as they are."""
+    sleeps = []
+    monkeypatch.setattr("power_decos.retry_decorator.sleep", sleeps.append)
+
+    @retry(retries=20, delay=0.1, backoff="full_jitter", max_delay=0.5)
+    def full_jitter():
+        raise Exception("This is a test for the @retry decorator")
+
+    full_jitter()
+    assert all(0 <= wait <= min(0.5, 0.1 * 2 ** attempt) for attempt, wait in enumerate(sleeps))
+
+    sleeps.clear()
+
+    @retry(retries=20, delay=0.1, backoff="decorrelated_jitter", max_delay=2)
+    def decorrelated_jitter():
+        raise Exception("This is a test for the @retry decorator")
+
+    decorrelated_jitter()
+    assert all(0.1 <= wait <= 2 for wait in sleeps)
+
+    sleeps.clear()
+
+    @retry(retries=4, delay=0.1, backoff=lambda attempt, previous: attempt / 100)
+    def custom():
+        raise Exception("This is a test for the @retry decorator")
+
+    custom()
+    assert sleeps == [0.01, 0.02, 0.03]
+
+
+def test_retry_deadline_stops_retrying():
+    """Test that no retry is started once its delay would exceed the deadline."""
+    tries = 0
+
+    @retry(retries=None, delay=0.05, deadline=0.3, raise_exception=True)
+    def always_fail():
+        nonlocal tries
+        tries += 1
+        raise Exception("This is a test for the @retry decorator")
+
+    start_time = time.monotonic()
+    with pytest.raises(Exception, match="This is a test"):
+        always_fail()
+    assert time.monotonic() - start_time < 0.3
+    assert 2 <= tries <= 6
+
+    with pytest.raises(ValueError, match="retries can only be None when a deadline is given"):
+        retry(retries=None)
+    with pytest.raises(ValueError, match="backoff must be"):
+        retry(backoff="linear")
+
+
+def test_retry_coroutine_function():
+    """Test that coroutine functions are retried with a non blocking backoff."""
+    tries = 0
+
+    @retry(retries=3, delay=0.05, raise_exception=True)
+    async def flaky():
+        nonlocal tries
+        tries += 1
+        if tries < 3:
+            raise Exception("This is a test for the @retry decorator")
+        return "done"
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker_task = asyncio.create_task(ticker())
+        result = await flaky()
+        ticker_task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(main())
+    assert result == "done" and tries == 3
+    assert ticks >= 5, "The event loop should keep running while the wrapper backs off"
+
+
+def test_retry_coroutine_cancellation():
+    """Test that cancelling the async wrapper cancels the backoff instead of retrying."""
+    tries = 0
+
+    @retry(retries=5, delay=10, exception_types=BaseException)
+    async def always_fail():
+        nonlocal tries
+        tries += 1
+        raise Exception("This is a test for the @retry decorator")
+
+    async def main():
+        task = asyncio.create_task(always_fail())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert tries == 1
+
+
+def test_retry_hedges_slow_attempts():
+    """Test that a slow attempt gets a duplicate and the first successful one wins."""
+    calls = 0
+
+    @retry(retries=1, delay=1, hedge_after=0.05, max_hedges=2)
+    def slow_then_fast():
+        nonlocal calls
+        calls += 1
+        time.sleep(0.5 if calls == 1 else 0.01)
+        return calls
+
+    start_time = time.monotonic()
+    assert slow_then_fast() == 2
+    assert time.monotonic() - start_time < 0.3, "The hedged duplicate should win"
+    assert calls == 2, "A duplicate finishing in time should not trigger another hedge"
+
+
+def test_retry_hedges_coroutines_and_cancels_losers():
+    """Test that coroutine attempts are hedged as tasks and the losing task is cancelled."""
+    calls = 0
+    cancelled = 0
+
+    @retry(retries=1, delay=1, hedge_after=0.05)
+    async def slow_then_fast():
+        nonlocal calls, cancelled
+        calls += 1
+        try:
+            await asyncio.sleep(0.5 if calls == 1 else 0.01)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+        return calls
+
+    async def main():
+        result = await slow_then_fast()
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == 2
+    assert cancelled == 1
+
+
+def test_retry_hedged_functions_are_isolated():
+    """Test that hung hedged attempts of one function don't stall the hedged attempts of another one."""
+    release = threading.Event()
+
+    @retry(retries=1, delay=0.01, hedge_after=0.01, max_abandoned=40)
+    def stuck():
+        release.wait(5)
+
+    @retry(retries=1, delay=0.01, raise_exception=True, hedge_after=0.05)
+    def healthy():
+        time.sleep(0.01)
+        return True
+
+    threads = [threading.Thread(target=stuck) for _ in range(20)]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        start_time = time.monotonic()
+        assert healthy()
+        assert time.monotonic() - start_time < 0.5
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_retry_learned_hedge_threshold():
+    """Test that a percentile threshold is only used once enough latencies were recorded."""
+    with pytest.raises(ValueError, match="hedge_after must be > 0 or a percentile"):
+        retry(hedge_after="p200")
+
+    hedger = _Hedger("p50")
+    for _ in range(19):
+        hedger.call(lambda: True, (), {})
+    assert hedger.threshold is None
+    hedger.call(lambda: True, (), {})
+    assert hedger.threshold is not None and hedger.threshold < 0.1
+
+
+def test_retry_attempt_timeout():
+    """Test that hung attempts are abandoned and retried, and abandoned threads are bounded."""
+    calls = 0
+
+    @retry(retries=3, delay=0.01, raise_exception=True, attempt_timeout=0.05)
+    def hangs_once():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            time.sleep(0.3)
+        return calls
+
+    start_time = time.monotonic()
+    assert hangs_once() == 2
+    assert time.monotonic() - start_time < 0.25
+
+    @retry(retries=3, delay=0.01, raise_exception=True, attempt_timeout=0.02, max_abandoned=2)
+    def always_hangs():
+        nonlocal calls
+        calls += 1
+        time.sleep(0.3)
+
+    calls = 0
+    with pytest.raises(TimeoutError, match="timed out attempts are still running"):
+        always_hangs()
+    assert calls == 2, "No attempt should be started once max_abandoned attempts are still running"
+
+
+def test_retry_attempt_timeout_isolates_functions():
+    """Test that hung attempts of one function don't starve the attempts of another one."""
+    release = threading.Event()
+
+    @retry(retries=1, delay=0.01, attempt_timeout=0.01, max_abandoned=40)
+    def stuck():
+        release.wait(5)
+
+    @retry(retries=1, delay=0.01, raise_exception=True, attempt_timeout=0.5)
+    def healthy():
+        return True
+
+    try:
+        for _ in range(40):
+            stuck()
+        assert healthy()
+    finally:
+        release.set()
+
+
+def test_retry_attempt_timeout_concurrent_callers():
+    """Test that waiting for a free thread does not count against the timeout of an attempt."""
+    @retry(retries=1, delay=0.01, attempt_timeout=0.3)
+    def healthy():
+        time.sleep(0.2)
+        return True
+
+    with ThreadPoolExecutor(64) as executor:
+        results = list(executor.map(lambda _: healthy(), range(64)))
+    assert results == [True] * 64
+
+
+def test_retry_hedged_attempt_timeout():
+    """Test that concurrent hedged calls with a timeout don't deadlock and still time out hung attempts."""
+    @retry(retries=1, delay=0.01, raise_exception=True, hedge_after=0.05, attempt_timeout=1)
+    def slow():
+        time.sleep(0.2)
+        return True
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(slow())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert results == [True] * 10
+
+    release = threading.Event()
+
+    @retry(retries=1, delay=0.01, raise_exception=True, hedge_after=0.01, attempt_timeout=0.05)
+    def hangs():
+        release.wait(5)
+
+    start_time = time.monotonic()
+    try:
+        with pytest.raises(TimeoutError, match="Attempt timed out"):
+            hangs()
+    finally:
+        release.set()
+    assert time.monotonic() - start_time < 0.5
+
+
+def test_retry_attempt_timeout_coroutine():
+    """Test that coroutine attempts exceeding the timeout are cancelled and retried."""
+    calls = 0
+    cancelled = 0
+
+    @retry(retries=2, delay=0.01, raise_exception=True, attempt_timeout=0.05)
+    async def hangs_once():
+        nonlocal calls, cancelled
+        calls += 1
+        if calls == 1:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled += 1
+                raise
+        return calls
+
+    assert asyncio.run(hangs_once()) == 2
+    assert cancelled == 1
+
+
+def test_retry_batch_only_retries_failed_items():
+    """Test that only the failed items are retried and results are merged in input order."""
+    sent = []
+    failures = {"b": 2, "d": 1}
+
+    def failed_items(items, outcome):
+        return [index for index, result in enumerate(outcome) if result is None]
+
+    @retry_batch(failed_items, retries=3, delay=0.01)
+    def bulk_write(items, suffix=""):
+        sent.append(list(items))
+        results = []
+        for item in items:
+            if failures.get(item, 0):
+                failures[item] -= 1
+                results.append(None)
+            else:
+                results.append(item.upper() + suffix)
+        return results
+
+    assert bulk_write(["a", "b", "c", "d"], suffix="!") == ["A!", "B!", "C!", "D!"]
+    assert sent == [["a", "b", "c", "d"], ["b", "d"], ["b"]]
+
+
+def test_retry_batch_exceptions():
+    """Test that a raised exception fails every item unless the extractor narrows them down."""
+    sent = []
+
+    @retry_batch(lambda items, outcome: None, retries=2, delay=0.01, raise_exception=True)
+    def always_fail(items):
+        sent.append(list(items))
+        raise Exception("This is a test for the @retry decorator")
+
+    with pytest.raises(Exception, match="This is a test"):
+        always_fail([1, 2])
+    assert sent == [[1, 2], [1, 2]]
+
+    def failed_items(items, outcome):
+        if isinstance(outcome, Exception):
+            return [items.index(item) for item in outcome.args[0]]
+        return []
+
+    @retry_batch(failed_items, retries=2, delay=0.01)
+    def partially_fail(items):
+        if 2 in items and len(items) > 1:
+            raise Exception([2])
+        return [item * 10 for item in items]
+
+    assert partially_fail([1, 2, 3]) == [None, 20, None], "Items of a raised attempt have no result to merge"
+
+
+def test_retry_stats_and_callbacks(caplog):
+    """Test the counters and callbacks, and that nothing is logged unless logging is enabled."""
+    tries = 0
+    retried, gave_up = [], []
+
+    @retry(retries=3, delay=0.01, on_retry=lambda attempt, exc, wait: retried.append((attempt, wait)),
+           on_giveup=lambda attempt, exc: gave_up.append((attempt, str(exc))))
+    def fails_twice(fail_always=False):
+        nonlocal tries
+        tries += 1
+        if fail_always or tries < 3:
+            raise Exception("This is a test for the @retry decorator")
+        return tries
+
+    with caplog.at_level(logging.DEBUG, logger="power_decos.retry_decorator"):
+        assert fails_twice() == 3
+        fails_twice(fail_always=True)
+    assert caplog.records == [], "Nothing should be logged without log=True"
+
+    assert retried == [(1, 0.01), (2, 0.01), (1, 0.01), (2, 0.01)]
+    assert gave_up == [(3, "This is a test for the @retry decorator")]
+    stats = fails_twice.stats()
+    assert stats["calls"] == 2 and stats["attempts"] == 6 and stats["retries"] == 4 and stats["exhausted"] == 1
+    assert stats["sleep_time"] == pytest.approx(0.04)
+
+    fails_twice.reset_stats()
+    assert fails_twice.stats()["calls"] == 0
+
+
+def test_retry_opt_in_logging(caplog):
+    """Test that log=True logs retries and give-ups but not successful attempts."""
+    @retry(retries=2, delay=0.01, log=True)
+    def always_fail():
+        raise Exception("This is a test for the @retry decorator")
+
+    @retry(retries=2, delay=0.01, log=True)
+    def succeed():
+        return True
+
+    with caplog.at_level(logging.DEBUG, logger="power_decos.retry_decorator"):
+        succeed()
+        assert caplog.records == []
+        always_fail()
+
+    assert [record.levelname for record in caplog.records] == ["WARNING", "ERROR"]
+    assert "failed after 2 attempts" in caplog.records[-1].getMessage()
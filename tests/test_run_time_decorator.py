@@ -1,6 +1,10 @@
 import logging
+import os
+import subprocess
+import sys
 
-from power_decos import get_time
+from power_decos import get_time, TimingRegistry
+import time
 import pytest
 
 def test_decorator_logs_execution_time(caplog):
@@ -13,3 +17,104 @@ def test_decorator_logs_execution_time(caplog):
 
     assert result == "test"
     assert "Function sample_function took" in caplog.text
+
+
+def test_import_leaves_logging_unconfigured():
+    """Test that importing the package does not configure the root logger of the application."""
+    script = "import logging, power_decos; print(logging.getLogger().handlers)"
+    output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(__file__))).stdout
+    assert output == "[]\n"
+
+
+def test_registry_records_histogram():
+    """Test that registry mode aggregates durations instead of logging every call."""
+    registry = TimingRegistry()
+
+    @get_time(registry=registry)
+    def sleepy(duration):
+        time.sleep(duration)
+
+    for duration in [0.001] * 9 + [0.05]:
+        sleepy(duration)
+
+    report = registry.report()[f"{__name__}.test_registry_records_histogram.<locals>.sleepy"]
+    assert report["count"] == 10
+    assert 0.001 <= report["min"] <= report["p50"] < 0.05 <= report["max"]
+    assert report["p99"] == pytest.approx(report["max"], rel=0.02)
+    assert report["sum"] == pytest.approx(0.059, abs=0.03)
+
+    registry.report(reset=True)
+    assert registry.report()[f"{__name__}.test_registry_records_histogram.<locals>.sleepy"]["count"] == 0
+
+
+def test_registry_periodic_dumps():
+    """Test that dump_every passes the report to the sink until the dumps are stopped."""
+    registry = TimingRegistry()
+    reports = []
+
+    @get_time(registry=registry)
+    def noop():
+        pass
+
+    noop()
+    registry.dump_every(0.02, sink=reports.append)
+    time.sleep(0.1)
+    registry.stop_dumps()
+    dumped = len(reports)
+    time.sleep(0.05)
+
+    assert dumped >= 2 and len(reports) == dumped
+    assert all(report[f"{__name__}.test_registry_periodic_dumps.<locals>.noop"]["count"] == 1 for report in reports)
+
+
+def test_sampling_times_one_in_n_calls():
+    """Test that sample_every only times every n-th call and sample_rate roughly the given fraction."""
+    registry = TimingRegistry()
+
+    @get_time(registry=registry, sample_every=10)
+    def every_tenth():
+        pass
+
+    @get_time(registry=registry, sample_rate=0.1)
+    def random_tenth():
+        pass
+
+    for _ in range(1000):
+        every_tenth()
+        random_tenth()
+
+    report = registry.report()
+    assert report[f"{__name__}.test_sampling_times_one_in_n_calls.<locals>.every_tenth"]["count"] == 100
+    assert 50 <= report[f"{__name__}.test_sampling_times_one_in_n_calls.<locals>.random_tenth"]["count"] <= 150
+
+    with pytest.raises(ValueError, match="Only one of sample_every and sample_rate"):
+        get_time(sample_every=2, sample_rate=0.5)
+
+
+def test_slow_threshold_reports_outliers_only(caplog):
+    """Test that only calls above the threshold are reported, with their arguments and calling stack."""
+    slow_calls = []
+
+    @get_time(slow_threshold=0.02, on_slow=slow_calls.append)
+    def maybe_slow(duration):
+        time.sleep(duration)
+
+    with caplog.at_level(logging.INFO):
+        maybe_slow(0)
+        maybe_slow(0.03)
+
+    assert caplog.records == [], "Fast calls should not be logged"
+    assert len(slow_calls) == 1
+    call = slow_calls[0]
+    assert call["function"].endswith("maybe_slow") and call["duration"] >= 0.03
+    assert call["args"] == "(0.03,)"
+    assert "test_slow_threshold_reports_outliers_only" in call["stack"]
+
+    @get_time(slow_threshold=0.01)
+    def slow(text):
+        time.sleep(0.02)
+
+    with caplog.at_level(logging.INFO):
+        slow("y" * 500)
+    assert "Slow call of" in caplog.text and "..." in caplog.text, "Long arguments should be abbreviated"